@@ -0,0 +1,364 @@
+"""
+An asyncio front end to the puzzle_tools solvers, so an event loop can
+solve puzzles without blocking, and a JSON-lines server built on it.
+
+    python async_solver.py < requests.jsonl > responses.jsonl
+
+reads one request per line, such as
+
+    {"id": 1, "type": "mn", "from": [["*", "2"], ["1", "3"]],
+     "to": [["1", "2"], ["3", "*"]], "strategy": "breadth_first",
+     "timeout": 5}
+
+and writes one response per line as each solve finishes, in whatever
+order they finish.
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sys
+import threading
+from time import perf_counter
+
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+from mn_puzzle import MNPuzzle
+from puzzle_tools import Budget, BudgetExceeded, SearchStats, STRATEGIES
+from sudoku_puzzle import SudokuPuzzle
+from word_ladder_puzzle import WordLadderPuzzle
+
+
+class AsyncSolver:
+    """
+    Solves puzzles on a pool of threads for an asyncio event loop.
+
+    Requests wait in a bounded queue: once it is full, submit() waits
+    for room, which pushes back on whoever is submitting.  At most
+    concurrency solves run at once.  Each solve runs under a Budget
+    whose cancel event is set when its request is cancelled, and whose
+    time limit is what is left of the request's timeout, counted from
+    submission so that time spent waiting in the queue counts too.  A
+    thread never keeps searching for a request nobody is waiting on.
+    """
+
+    def __init__(self, concurrency=4, queue_size=64, strategy="depth_first",
+                 timeout=None):
+        """
+        Create a new AsyncSolver self running up to concurrency solves
+        at once, holding up to queue_size waiting requests, solving with
+        the solver named strategy in puzzle_tools.STRATEGIES and giving
+        each solve timeout seconds, unless a request says otherwise.
+
+        Use it as an async context manager, or call start() and close().
+
+        @type self: AsyncSolver
+        @type concurrency: int
+        @type queue_size: int
+        @type strategy: str
+        @type timeout: float | None
+        @rtype: None
+        """
+        self.concurrency, self.queue_size = concurrency, queue_size
+        self.strategy, self.timeout = strategy, timeout
+        self._queue = self._executor = None
+        self._workers = []
+
+    async def start(self):
+        """
+        Start the workers of AsyncSolver self on the running loop.
+
+        @type self: AsyncSolver
+        @rtype: None
+        """
+        self._queue = asyncio.Queue(self.queue_size)
+        self._executor = ThreadPoolExecutor(self.concurrency)
+        self._workers = [asyncio.create_task(self._work())
+                         for _ in range(self.concurrency)]
+
+    async def close(self):
+        """
+        Wait for every submitted request of AsyncSolver self to finish,
+        then stop its workers.
+
+        @type self: AsyncSolver
+        @rtype: None
+        """
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        """
+        Start AsyncSolver self and return it.
+
+        @type self: AsyncSolver
+        @rtype: AsyncSolver
+        """
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """
+        Close AsyncSolver self.
+
+        @type self: AsyncSolver
+        @rtype: None
+        """
+        await self.close()
+
+    async def submit(self, puzzle, strategy=None, timeout=None):
+        """
+        Queue puzzle to be solved by AsyncSolver self and return a
+        future of what the solver returns, waiting first while the
+        queue is full.  Cancelling the future cancels the solve.  The
+        timeout, if any, runs from now, waiting included.
+
+        @type self: AsyncSolver
+        @type puzzle: Puzzle
+        @type strategy: str | None
+        @type timeout: float | None
+        @rtype: asyncio.Future
+        """
+        strategy = strategy or self.strategy
+        if strategy not in STRATEGIES:
+            raise ValueError("unknown strategy {!r}".format(strategy))
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        cancel = threading.Event()
+        future.add_done_callback(lambda f: f.cancelled() and cancel.set())
+        if timeout is None:
+            timeout = self.timeout
+        deadline = None if timeout is None else loop.time() + timeout
+        await self._queue.put((puzzle, STRATEGIES[strategy],
+                               Budget(cancel=cancel), deadline, future))
+        return future
+
+    async def solve(self, puzzle, strategy=None, timeout=None):
+        """
+        Return what the solver returns for puzzle, solved by
+        AsyncSolver self: a PuzzleNode, None, or a BudgetExceeded if
+        timeout ran out first.
+
+        @type self: AsyncSolver
+        @type puzzle: Puzzle
+        @type strategy: str | None
+        @type timeout: float | None
+        @rtype: PuzzleNode | BudgetExceeded | None
+
+        >>> async def demo():
+        ...     async with AsyncSolver(concurrency=2) as solver:
+        ...         ws = {"sad", "bad", "bat"}
+        ...         return await asyncio.gather(*[
+        ...             solver.solve(WordLadderPuzzle(w, "bat", ws),
+        ...                          "breadth_first") for w in ws])
+        >>> sorted(len(list(s.puzzles())) for s in asyncio.run(demo()))
+        [1, 2, 3]
+        >>> async def expired():
+        ...     async with AsyncSolver() as solver:
+        ...         return await solver.solve(
+        ...             WordLadderPuzzle("sad", "bat", {"sad", "bat"}),
+        ...             timeout=0)
+        >>> asyncio.run(expired()).reason
+        'time_limit'
+        """
+        return await (await self.submit(puzzle, strategy, timeout))
+
+    async def _work(self):
+        """
+        Solve requests from the queue of AsyncSolver self, one at a time,
+        until cancelled.
+
+        @type self: AsyncSolver
+        @rtype: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            puzzle, solver, budget, deadline, future = await self._queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                if deadline is not None:
+                    budget.time_limit = deadline - loop.time()
+                    if budget.time_limit <= 0:
+                        future.set_result(BudgetExceeded("time_limit",
+                                                         SearchStats()))
+                        continue
+                try:
+                    result = await loop.run_in_executor(
+                        self._executor,
+                        lambda: solver(puzzle, budget=budget))
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+
+WORDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "words")
+
+# word sets already read, by file name
+_word_sets = {}
+
+
+def puzzle_from_json(request):
+    """
+    Return the puzzle described by the dict request, whose "type" is
+    "mn" (with "from" and "to" grids), "sudoku" (with "n", "symbols"
+    and optionally "symbol_set"), "peg" (with a "grid") or
+    "word_ladder" (with "from" and "to" words, and optionally a "words"
+    file name).
+
+    @type request: dict
+    @rtype: Puzzle
+
+    >>> puzzle_from_json({"type": "mn", "from": [["*", "1"]],
+    ...                   "to": [["1", "*"]]}).from_grid
+    (('*', '1'),)
+    """
+    kind = request["type"]
+    if kind == "mn":
+        return MNPuzzle(tuple(map(tuple, request["from"])),
+                        tuple(map(tuple, request["to"])))
+    elif kind == "sudoku":
+        symbols = list(request["symbols"])
+        symbol_set = set(request.get("symbol_set") or
+                         set(symbols) - {"*"})
+        return SudokuPuzzle(request["n"], symbols, symbol_set)
+    elif kind == "peg":
+        return GridPegSolitairePuzzle([list(row) for row in request["grid"]],
+                                      {"*", ".", "#"})
+    elif kind == "word_ladder":
+        name = request.get("words", WORDS)
+        if name not in _word_sets:
+            with open(name) as words:
+                _word_sets[name] = set(words.read().split())
+        return WordLadderPuzzle(request["from"], request["to"],
+                                _word_sets[name])
+    raise ValueError("unknown puzzle type {!r}".format(kind))
+
+
+async def _answer(request, future, start, write):
+    """
+    Write the response to request, once future is done, with write.
+
+    @type request: dict
+    @type future: asyncio.Future
+    @type start: float
+    @type write: (dict) -> None
+    @rtype: None
+    """
+    response = {"id": request.get("id")}
+    try:
+        result = await future
+    except Exception as error:
+        response.update(status="error", error=repr(error))
+    else:
+        if isinstance(result, BudgetExceeded):
+            response.update(status=result.reason)
+        elif result is None:
+            response.update(status="unsolvable")
+        else:
+            response.update(status="solved",
+                            path=[str(p) for p in result.puzzles()])
+    response["seconds"] = perf_counter() - start
+    write(response)
+
+
+async def serve(solver, lines, write):
+    """
+    Answer each JSON request from the async iterator lines with
+    AsyncSolver solver, passing each response dict to write.  Reading
+    stops while the solver's queue is full.  Only the answers still
+    pending are held, so a long-running server does not grow.
+
+    @type solver: AsyncSolver
+    @type lines: async iterator[str]
+    @type write: (dict) -> None
+    @rtype: None
+
+    >>> async def demo(*requests):
+    ...     async def lines():
+    ...         for request in requests:
+    ...             yield request
+    ...     async with AsyncSolver() as solver:
+    ...         await serve(solver, lines(), responses.append)
+    >>> responses = []
+    >>> asyncio.run(demo('{"id": 7, "type": "mn", "from": [["*", "1"]], '
+    ...                  '"to": [["1", "*"]], "strategy": "nope"}', '{'))
+    >>> [(r["id"], r["status"]) for r in responses]
+    [(7, 'error'), (None, 'error')]
+    """
+    answers = set()
+    async for line in lines:
+        if not line.strip():
+            continue
+        start, request = perf_counter(), {}
+        try:
+            request = json.loads(line)
+            future = await solver.submit(puzzle_from_json(request),
+                                         request.get("strategy"),
+                                         request.get("timeout"))
+        except Exception as error:
+            write({"id": request.get("id") if isinstance(request, dict)
+                   else None, "status": "error", "error": repr(error)})
+            continue
+        answer = asyncio.create_task(_answer(request, future, start, write))
+        answers.add(answer)
+        answer.add_done_callback(answers.discard)
+    await asyncio.gather(*answers)
+
+
+async def _stdin_lines():
+    """
+    Yield the lines of standard input without blocking the event loop.
+
+    @rtype: async iterator[str]
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            return
+        yield line
+
+
+def _write_line(response):
+    """
+    Write response to standard output as one line of JSON.
+
+    @type response: dict
+    @rtype: None
+    """
+    sys.stdout.write(json.dumps(response) + "\n")
+    sys.stdout.flush()
+
+
+async def _main(args):
+    """
+    Serve standard input to standard output with the options in args.
+
+    @type args: argparse.Namespace
+    @rtype: None
+    """
+    async with AsyncSolver(args.concurrency, args.queue_size,
+                           args.strategy, args.timeout) as solver:
+        await serve(solver, _stdin_lines(), _write_line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="most solves running at once")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="most requests waiting to be solved")
+    parser.add_argument("--strategy", default="depth_first",
+                        choices=sorted(STRATEGIES))
+    parser.add_argument("--timeout", type=float,
+                        help="default seconds allowed per solve")
+    asyncio.run(_main(parser.parse_args()))
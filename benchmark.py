@@ -0,0 +1,261 @@
+"""
+Reproducible timings of the puzzle solvers on a fixed corpus.
+
+Run
+
+    python benchmark.py --output baseline.json
+
+to time every case, then later
+
+    python benchmark.py --compare baseline.json
+
+to time them again and flag any case that got slower, or expanded more
+nodes, than it did in the saved run.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+from time import perf_counter
+
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+from mn_puzzle import MNPuzzle
+from puzzle_tools import (breadth_first_solve, depth_first_solve,
+                          in_place_depth_first_solve, SearchStats)
+from sudoku_puzzle import SudokuPuzzle
+from word_ladder_puzzle import WordLadderPuzzle
+
+WORDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "words")
+SUDOKU_SYMBOLS = {"1", "2", "3", "4", "5", "6", "7", "8", "9"}
+
+
+def _sudoku(rows):
+    """
+    Return a 9x9 SudokuPuzzle whose rows are the strings in rows, with
+    "*" for empty cells.
+
+    @type rows: list[str]
+    @rtype: SudokuPuzzle
+    """
+    return SudokuPuzzle(9, [c for row in rows for c in row], SUDOKU_SYMBOLS)
+
+
+def _word_set():
+    """
+    Return the set of words in the bundled words file.
+
+    @rtype: set[str]
+    """
+    with open(WORDS) as words:
+        return set(words.read().split())
+
+
+# each case is (name, function returning a fresh puzzle, solver); these
+# are the instances the puzzle modules used to time in their __main__
+CORPUS = [
+    ("mn_2x3_bfs",
+     lambda: MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+                      (("1", "2", "3"), ("4", "5", "*"))),
+     breadth_first_solve),
+    ("mn_2x3_dfs",
+     lambda: MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+                      (("1", "2", "3"), ("4", "5", "*"))),
+     depth_first_solve),
+    ("sudoku_july_2015_dfs",
+     lambda: _sudoku(["***7*8*1*", "**7*9***6", "9*31*****",
+                      "35*8**6*1", "*********", "1*6**9*48",
+                      "*****12*7", "8***7*4**", "*6*3*2***"]),
+     depth_first_solve),
+    ("sudoku_3star_dfs",
+     lambda: _sudoku(["***9*2***", "*91***63*", "*3**7**8*",
+                      "3*******8", "**9***2**", "5*******7",
+                      "*7**8**4*", "*45***81*", "***3*6***"]),
+     depth_first_solve),
+    ("sudoku_4star_dfs",
+     lambda: _sudoku(["56***7**9", "*7**48*31", "*********",
+                      "43*******", "*8*****9*", "*******26",
+                      "*********", "19*36**7*", "7**1***42"]),
+     depth_first_solve),
+    ("sudoku_3star_in_place_dfs",
+     lambda: _sudoku(["***9*2***", "*91***63*", "*3**7**8*",
+                      "3*******8", "**9***2**", "5*******7",
+                      "*7**8**4*", "*45***81*", "***3*6***"]),
+     in_place_depth_first_solve),
+    ("peg_5x5_dfs",
+     lambda: GridPegSolitairePuzzle([list("*****"), list("*****"),
+                                     list("*****"), list("**.**"),
+                                     list("*****")], {"*", ".", "#"}),
+     depth_first_solve),
+    ("peg_5x5_in_place_dfs",
+     lambda: GridPegSolitairePuzzle([list("*****"), list("*****"),
+                                     list("*****"), list("**.**"),
+                                     list("*****")], {"*", ".", "#"}),
+     in_place_depth_first_solve),
+    ("ladder_same_cost_bfs",
+     lambda: WordLadderPuzzle("same", "cost", _word_set()),
+     breadth_first_solve),
+    ("ladder_same_cost_dfs",
+     lambda: WordLadderPuzzle("same", "cost", _word_set()),
+     depth_first_solve),
+]
+
+
+def percentile(samples, fraction):
+    """
+    Return the nearest-rank percentile fraction of samples.
+
+    @type samples: list[float]
+    @type fraction: float
+    @rtype: float
+
+    >>> percentile([5, 1, 4, 2, 3], 0.95)
+    5
+    >>> percentile([5, 1, 4, 2, 3], 0.5)
+    3
+    """
+    ordered = sorted(samples)
+    return ordered[max(1, math.ceil(len(ordered) * fraction)) - 1]
+
+
+def run_case(make_puzzle, solver, repeat=5, warmup=1):
+    """
+    Return the timings of solving a fresh make_puzzle() with solver
+    repeat times, after warmup untimed runs, as a dict with the median
+    and p95 seconds, every sample, the nodes expanded, and whether a
+    solution was found.
+
+    Puzzles are built outside the timed region.  The first warmup run
+    always happens and counts the nodes expanded, so gathering them
+    costs the timed samples nothing.
+
+    @type make_puzzle: () -> Puzzle
+    @type solver: (Puzzle) -> PuzzleNode | None
+    @type repeat: int
+    @type warmup: int
+    @rtype: dict
+    """
+    stats = SearchStats()
+    solution = solver(make_puzzle(), stats=stats)
+    for _ in range(warmup - 1):
+        solver(make_puzzle())
+    samples = []
+    for _ in range(repeat):
+        puzzle = make_puzzle()
+        start = perf_counter()
+        solver(puzzle)
+        samples.append(perf_counter() - start)
+    return {"median": statistics.median(samples),
+            "p95": percentile(samples, 0.95),
+            "samples": samples,
+            "nodes_expanded": stats.nodes_expanded,
+            "solved": solution is not None}
+
+
+def run(names=None, repeat=5, warmup=1, out=sys.stdout):
+    """
+    Return the results of running every case of CORPUS named in names
+    (or all of them) as a dict ready to be saved as JSON, printing a
+    line per case to out.
+
+    @type names: list[str] | None
+    @type repeat: int
+    @type warmup: int
+    @type out: file
+    @rtype: dict
+    """
+    cases = {}
+    for name, make_puzzle, solver in CORPUS:
+        if names and name not in names:
+            continue
+        cases[name] = run_case(make_puzzle, solver, repeat, warmup)
+        print("{:<24} median {:9.4f}s  p95 {:9.4f}s  {:>9} nodes".format(
+            name, cases[name]["median"], cases[name]["p95"],
+            cases[name]["nodes_expanded"]), file=out)
+    return {"meta": {"python": platform.python_version(),
+                     "implementation": platform.python_implementation(),
+                     "machine": platform.machine(),
+                     "repeat": repeat, "warmup": warmup},
+            "cases": cases}
+
+
+def compare(results, baseline, threshold=0.10):
+    """
+    Return a list of (case, metric, baseline value, new value) for every
+    case of results that regressed against baseline: a median time more
+    than threshold (a fraction) slower, or more nodes expanded.  Cases
+    missing from either run are skipped.
+
+    @type results: dict
+    @type baseline: dict
+    @type threshold: float
+    @rtype: list[(str, str, float, float)]
+
+    >>> old = {"cases": {"a": {"median": 1.0, "nodes_expanded": 10}}}
+    >>> new = {"cases": {"a": {"median": 1.2, "nodes_expanded": 10}}}
+    >>> compare(new, old)
+    [('a', 'median', 1.0, 1.2)]
+    >>> compare(new, old, threshold=0.5)
+    []
+    """
+    regressions = []
+    for name, case in sorted(results["cases"].items()):
+        old = baseline["cases"].get(name)
+        if old is None:
+            continue
+        if case["median"] > old["median"] * (1 + threshold):
+            regressions.append((name, "median", old["median"],
+                                case["median"]))
+        if case["nodes_expanded"] > old["nodes_expanded"]:
+            regressions.append((name, "nodes_expanded",
+                                old["nodes_expanded"],
+                                case["nodes_expanded"]))
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmark command line with arguments argv, returning the
+    exit status: 1 if a comparison found regressions, 0 otherwise.
+
+    @type argv: list[str] | None
+    @rtype: int
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("cases", nargs="*",
+                        help="names of the cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed runs per case")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="untimed runs per case before timing")
+    parser.add_argument("--output", help="write the results as JSON here")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="JSON results of an earlier run to compare to")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="fraction a median may grow before it is "
+                             "flagged (default 0.10)")
+    parser.add_argument("--list", action="store_true",
+                        help="list the case names and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, _, _ in CORPUS:
+            print(name)
+        return 0
+    results = run(args.cases, max(1, args.repeat), max(1, args.warmup))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as saved:
+            regressions = compare(results, json.load(saved), args.threshold)
+        for name, metric, old, new in regressions:
+            print("REGRESSION {}: {} {} -> {}".format(name, metric, old, new))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
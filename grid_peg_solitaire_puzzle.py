@@ -1,11 +1,25 @@
 from puzzle import Puzzle
+from functools import lru_cache
+
+try:
+    _popcount = int.bit_count
+except AttributeError:
+    # before Python 3.10
+    def _popcount(n):
+        return bin(n).count("1")
 
 
 class GridPegSolitairePuzzle(Puzzle):
     """
     Snapshot of peg solitaire on a rectangular grid. May be solved,
     unsolved, or even unsolvable.
+
+    The pegs are the bits of an int, bit i for the cell i in reading
+    order.  The shape of the board, its unused cells and every jump it
+    allows live in a _Board shared by all puzzles on that board, so a
+    jump is a test and an exclusive or of masks.
     """
+    __slots__ = ("_board", "_pegs", "_marker_set")
 
     def __init__(self, marker, marker_set):
         """
@@ -22,7 +36,56 @@ class GridPegSolitairePuzzle(Puzzle):
         assert all([len(x) == len(marker[0]) for x in marker[1:]])
         assert all([all(x in marker_set for x in row) for row in marker])
         assert all([x == "*" or x == "." or x == "#" for x in marker_set])
-        self._marker, self._marker_set = marker, marker_set
+        self._board = _board(len(marker), len(marker[0]),
+                             sum(1 << i for i, c in enumerate(
+                                 c for row in marker for c in row)
+                                 if c == "#"))
+        self._pegs = sum(1 << i for i, c in enumerate(
+            c for row in marker for c in row) if c == "*")
+        self._marker_set = marker_set
+
+    @property
+    def marker(self):
+        """
+        The grid of GridPegSolitairePuzzle self, as a new list of rows of
+        "*" for pegs, "." for empty cells and "#" for unused ones.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: list[list[str]]
+
+        >>> grid = [["*", "*", "."], [".", "#", "."]]
+        >>> GridPegSolitairePuzzle(grid, {"#", "*", "."}).marker == grid
+        True
+        """
+        board, pegs = self._board, self._pegs
+        cells = ["*" if pegs >> i & 1 else "#" if board.holes >> i & 1
+                 else "." for i in range(board.rows * board.columns)]
+        return [cells[i:i + board.columns]
+                for i in range(0, len(cells), board.columns)]
+
+    def _child(self, pegs):
+        """
+        Return the GridPegSolitairePuzzle on the board of
+        GridPegSolitairePuzzle self with the pegs in pegs.
+
+        @type self: GridPegSolitairePuzzle
+        @type pegs: int
+        @rtype: GridPegSolitairePuzzle
+        """
+        child = GridPegSolitairePuzzle.__new__(GridPegSolitairePuzzle)
+        child._board, child._pegs = self._board, pegs
+        child._marker_set = self._marker_set
+        return child
+
+    def __reduce__(self):
+        """
+        Return how to pickle GridPegSolitairePuzzle self: by its marker,
+        so the board is looked up again rather than copied.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: tuple
+        """
+        return GridPegSolitairePuzzle, (self.marker, self._marker_set)
 
     def __eq__(self, other):
         """
@@ -61,7 +124,48 @@ class GridPegSolitairePuzzle(Puzzle):
 
         """
         return (type(other) == type(self) and
-                self._marker == other._marker and self._marker_set == other._marker_set)
+                self._board is other._board and self._pegs == other._pegs
+                and self._marker_set == other._marker_set)
+
+    def __hash__(self):
+        """
+        Return a hash of GridPegSolitairePuzzle self consistent with __eq__.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+        """
+        return hash(self._pegs)
+
+    def state_key(self):
+        """
+        Return a hashable key for the current marker of
+        GridPegSolitairePuzzle self: the int of its pegs.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+
+        >>> grid = [["*", "*", "."], [".", "#", "."]]
+        >>> s = GridPegSolitairePuzzle(grid, {"#", "*", "."})
+        >>> s.state_key()
+        3
+        """
+        return self._pegs
+
+    def problem_key(self):
+        """
+        Return a key for the board and pegs of GridPegSolitairePuzzle
+        self, since its state key alone does not say what board it is
+        on.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: (int, int, int, int)
+
+        >>> grid = [["*", "*", "."], [".", "#", "."]]
+        >>> GridPegSolitairePuzzle(grid, {"#", "*", "."}).problem_key()
+        (2, 3, 16, 3)
+        """
+        board = self._board
+        return board.rows, board.columns, board.holes, self._pegs
 
     def __str__(self):
 
@@ -95,7 +199,7 @@ class GridPegSolitairePuzzle(Puzzle):
 
         """
         rep = ""
-        for row in self._marker:
+        for row in self.marker:
             for pegs in row:
                 rep += pegs + " "
             rep = rep[:-1]
@@ -120,37 +224,203 @@ class GridPegSolitairePuzzle(Puzzle):
         >>> print(len(list))
         4
         """
-        marker, marker_set = self._marker, self._marker_set
-        row = len(marker)-1
-        column = len(marker[0])-1
-        ext_list = []
-
-        if self.is_solved():
-            return ext_list
-
-        else:
-            for y in range(len(marker)):
-                for x in range(len(marker[y])):
-                    new_marker = [x[:] for x in marker]
-                    if marker[y][x] == '*':
-
-                        # check up
-                        if (y-2) >= 0 and marker[y-1][x] == '*' and marker[y-2][x] == '.':
-                                new_marker[y][x], new_marker[y-1][x], new_marker[y-2][x] = '.', '.', '*'
-                                ext_list.append(GridPegSolitairePuzzle(new_marker, marker_set))
-                        # check down
-                        elif (y+2) <= row and marker[y+1][x] == '*' and marker[y+2][x] == '.':
-                                new_marker[y][x], new_marker[y+1][x], new_marker[y+2][x] = '.', '.', '*'
-                                ext_list.append(GridPegSolitairePuzzle(new_marker, marker_set))
-                        # check left
-                        elif (x-2) >= 0 and marker[y][x-1] == '*' and marker[y][x-2] == '.':
-                                new_marker[y][x], new_marker[y][x-1], new_marker[y][x-2] = '.', '.', '*'
-                                ext_list.append(GridPegSolitairePuzzle(new_marker, marker_set))
-                        # check right
-                        elif (x+2) <= column and marker[y][x+1] == '*' and marker[y][x+2] == '.':
-                                new_marker[y][x], new_marker[y][x+1], new_marker[y][x+2] = '.', '.', '*'
-                                ext_list.append(GridPegSolitairePuzzle(new_marker, marker_set))
-            return ext_list
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """
+        Yield the puzzle configurations reachable from the current one,
+        one at a time, in the order of extensions().
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: iterator[GridPegSolitairePuzzle]
+
+        >>> grid = [["*","*","*","*","*"]]
+        >>> grid += [["*","*","*","*","*"]]
+        >>> grid += [["*","*",".","*","*"]]
+        >>> grid += [["*","*","*","*","*"]]
+        >>> grid += [["*","*","*","*","*"]]
+        >>> peg = GridPegSolitairePuzzle(grid,{"#",".","*"})
+        >>> list(peg.iter_extensions()) == peg.extensions()
+        True
+        >>> peg = GridPegSolitairePuzzle([["*", "*", "."], ["*", ".", "."],
+        ...                               [".", ".", "."]], {".", "*"})
+        >>> [str(ext).replace("\\n", " / ") for ext in peg.extensions()]
+        ['. * . / . . . / * . .', '. . * / * . . / . . .']
+        """
+        pegs = self._pegs
+        if not pegs & (pegs - 1):
+            return
+        jumps, rest = self._board.jumps, pegs
+        # each peg in reading order, lowest bit first
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            for need, land, flip in jumps[low.bit_length() - 1]:
+                if pegs & need == need and not pegs & land:
+                    yield self._child(pegs ^ flip)
+
+    def encode_state(self):
+        """
+        Return the pegs of GridPegSolitairePuzzle self as a
+        little-endian int of one bit per cell, rounded up to whole bytes.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: bytes
+
+        >>> grid = [["*", "*", "."], [".", "#", "."]]
+        >>> p = GridPegSolitairePuzzle(grid, {"#", "*", "."})
+        >>> p.encode_state()
+        b'\\x03'
+        >>> p.decode_state(p.encode_state()) == p
+        True
+        """
+        board = self._board
+        return self._pegs.to_bytes((board.rows * board.columns + 7) // 8,
+                                   "little")
+
+    def decode_state(self, data):
+        """
+        Return the GridPegSolitairePuzzle with the shape and marker set
+        of GridPegSolitairePuzzle self whose marker encode_state turned
+        into data.
+
+        @type self: GridPegSolitairePuzzle
+        @type data: bytes
+        @rtype: GridPegSolitairePuzzle
+        """
+        return self._child(int.from_bytes(data, "little"))
+
+    def legal_moves(self):
+        """
+        Return the moves of GridPegSolitairePuzzle self, in the order of
+        extensions().  A move is the mask of the three cells a jump
+        changes: the peg jumping, the peg jumped over and the empty cell
+        landed on.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: list[int]
+
+        >>> grid = [["*", "*", "."], [".", ".", "."]]
+        >>> GridPegSolitairePuzzle(grid, {"*", "."}).legal_moves()
+        [7]
+        """
+        pegs = self._pegs
+        if not pegs & (pegs - 1):
+            return []
+        jumps, rest, moves = self._board.jumps, pegs, []
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            for need, land, flip in jumps[low.bit_length() - 1]:
+                if pegs & need == need and not pegs & land:
+                    moves.append(flip)
+        return moves
+
+    def apply_move(self, move):
+        """
+        Jump a peg of GridPegSolitairePuzzle self as move says.
+
+        @type self: GridPegSolitairePuzzle
+        @type move: int
+        @rtype: None
+
+        >>> grid = [["*", "*", "."], [".", ".", "."]]
+        >>> p = GridPegSolitairePuzzle(grid, {"*", "."})
+        >>> p.apply_move(7)
+        >>> print(p)
+        . . *
+        . . .
+        >>> p.undo_move(7)
+        >>> print(p)
+        * * .
+        . . .
+        """
+        self._pegs ^= move
+
+    def undo_move(self, move):
+        """
+        Put back the pegs move jumped in GridPegSolitairePuzzle self.
+
+        @type self: GridPegSolitairePuzzle
+        @type move: int
+        @rtype: None
+        """
+        self._pegs ^= move
+
+    def copy(self):
+        """
+        Return a copy of GridPegSolitairePuzzle self.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: GridPegSolitairePuzzle
+        """
+        return self._child(self._pegs)
+
+    def fail_fast(self):
+        """
+        Return True iff GridPegSolitairePuzzle self can never be played
+        down to one peg, by one of the rules of fail_fast_reason().
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: bool
+
+        >>> GridPegSolitairePuzzle([list("**.")], {"*", "."}).fail_fast()
+        False
+        """
+        return self.fail_fast_reason() is not None
+
+    def fail_fast_reason(self):
+        """
+        Return the first of these rules that shows GridPegSolitairePuzzle
+        self can never be played down to one peg, or None:
+
+        "position_class": colour the cells by (x + y) % 3, and again by
+        (x - y) % 3.  The three cells of a jump have three different
+        colours, so every jump flips the parity of the number of pegs
+        of every colour.  One peg leaves one colour odd, or, after a
+        flip, two, so those parities name the colour of the last peg in
+        each colouring, or show there can be none.
+
+        "isolated": a peg that could never jump nor be jumped over, even
+        if every cell any peg could ever reach held one, is never
+        removed, so it cannot share the board with another peg.
+
+        "pagoda": for a cell s, weigh a peg d moves (Manhattan distance)
+        from s by the Fibonacci number F(D - d).  Since F(k) + F(k + 1)
+        = F(k + 2), no jump raises the total weight of the pegs, so if
+        it is below F(D), the weight of one peg on s, the last peg
+        cannot end up on s.  When that holds for every cell the
+        position classes allow, the board is dead.
+
+        Solvers count their prunes by these names in
+        SearchStats.fail_fast_reasons.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: str | None
+
+        >>> GridPegSolitairePuzzle([list("***..")], {"*", "."}
+        ...                        ).fail_fast_reason()
+        'position_class'
+        >>> GridPegSolitairePuzzle([list("*.*..")], {"*", "."}
+        ...                        ).fail_fast_reason()
+        'isolated'
+        >>> GridPegSolitairePuzzle([list("**..."), list("*...*"),
+        ...                         list(".....")], {"*", "."}
+        ...                        ).fail_fast_reason()
+        'pagoda'
+        """
+        board, pegs = self._board, self._pegs
+        finals = board.finals[_parity_class(pegs, board.classes[:3]),
+                              _parity_class(pegs, board.classes[3:])]
+        if not finals:
+            return "position_class"
+        if pegs & (pegs - 1) and pegs & ~board.movable(pegs):
+            return "isolated"
+        for weights, top in finals:
+            if sum([weights[i][pegs >> 8 * i & 255]
+                    for i in range(len(weights))]) >= top:
+                return None
+        return "pagoda"
 
     def is_solved(self):
 
@@ -177,23 +447,199 @@ class GridPegSolitairePuzzle(Puzzle):
         >>> r.is_solved()
         True
         """
-        marker = self._marker
+        # exactly one bit set: the lowest bit is all of them
+        pegs = self._pegs
+        return pegs != 0 and not pegs & (pegs - 1)
+
+
+def _parity_class(pegs, classes):
+    """
+    Return the colour the last peg must have in a colouring of the
+    board into three classes, whose masks are classes, by the parities
+    of the number of pegs of each colour, or None if no colour is
+    possible.
+
+    @type pegs: int
+    @type classes: tuple[int]
+    @rtype: int | None
+
+    >>> _parity_class(0b011, (0b001, 0b010, 0b100))
+    2
+    >>> _parity_class(0b111, (0b001, 0b010, 0b100)) is None
+    True
+    """
+    odd = [_popcount(pegs & mask) & 1 for mask in classes]
+    if sum(odd) == 1:
+        return odd.index(1)
+    if sum(odd) == 2:
+        return odd.index(0)
+    return None
+
+
+class _Board:
+    """
+    What every GridPegSolitairePuzzle on the same board shares: its
+    shape, the mask of its unused cells, the jumps from each cell, and
+    the tables of the rules of fail_fast().
+    """
+
+    def __init__(self, rows, columns, holes):
+        """
+        Create a new _Board self of rows x columns cells, with the
+        cells whose bits are set in holes unused.
+
+        jumps[i] lists the jumps of a peg on cell i as (need, land,
+        flip): the masks of the cells that must hold pegs, of the cell
+        that must be empty, and of all three, which a jump flips.  They
+        go up, down, left and right, skipping unused cells.
+
+        @type self: _Board
+        @type rows: int
+        @type columns: int
+        @type holes: int
+        @rtype: None
+        """
+        self.rows, self.columns, self.holes = rows, columns, holes
+        self.jumps = []
+        # the mask of the cells a jump in each direction can start from
+        starts = [0, 0, 0, 0]
+        for i in range(rows * columns):
+            y, x = divmod(i, columns)
+            jumps = []
+            for d, (dy, dx) in enumerate(((-1, 0), (1, 0), (0, -1), (0, 1))):
+                if not (0 <= y + 2 * dy < rows and
+                        0 <= x + 2 * dx < columns):
+                    continue
+                over = 1 << i + dy * columns + dx
+                land = 1 << i + 2 * (dy * columns + dx)
+                if not (over | land) & holes:
+                    jumps.append((1 << i | over, land, 1 << i | over | land))
+                    if not holes >> i & 1:
+                        starts[d] |= 1 << i
+            self.jumps.append(tuple(jumps))
+        # each direction as its step in bits and its starting cells
+        self.steps = list(zip((-columns, columns, -1, 1), starts))
+        cells = [i for i in range(rows * columns) if not holes >> i & 1]
+        # the masks of the colours (x + y) % 3, then (x - y) % 3
+        self.classes = tuple(
+            sum(1 << i for i in cells
+                if colour(*divmod(i, columns)) % 3 == c)
+            for colour in (lambda y, x: x + y, lambda y, x: x - y)
+            for c in range(3))
+        # finals[c1, c2]: for each cell the last peg could end on in
+        # colours c1 and c2, its pagoda as tables of the weight of each
+        # byte of the pegs, and the weight of a peg on it
+        top = rows + columns - 1
+        fibonacci = [0, 1]
+        while len(fibonacci) <= top:
+            fibonacci.append(fibonacci[-1] + fibonacci[-2])
+        self.finals = {}
+        for c1 in (None, 0, 1, 2):
+            for c2 in (None, 0, 1, 2):
+                self.finals[c1, c2] = []
+        for s in cells:
+            sy, sx = divmod(s, columns)
+            weight = [0] * (rows * columns)
+            for i in cells:
+                y, x = divmod(i, columns)
+                weight[i] = fibonacci[top - abs(y - sy) - abs(x - sx)]
+            tables = []
+            for start in range(0, rows * columns, 8):
+                tables.append([sum(weight[start + b] for b in range(8)
+                                   if byte >> b & 1 and
+                                   start + b < rows * columns)
+                               for byte in range(256)])
+            self.finals[(sx + sy) % 3, (sx - sy) % 3].append(
+                (tables, fibonacci[top]))
+
+    def movable(self, pegs):
+        """
+        Return the mask of the cells of pegs whose peg might still jump
+        or be jumped over on _Board self.  A cell can only get a peg by
+        a jump from a cell that can get one over another, so every cell
+        that could ever hold a peg is found by adding landing cells
+        until there are no more; the pegs able to jump or be jumped over
+        if all of those held pegs are the ones returned.
+
+        @type self: _Board
+        @type pegs: int
+        @rtype: int
+
+        >>> _board(1, 5, 0).movable(0b00101)
+        0
+        >>> _board(1, 6, 0b001000).movable(0b100011)
+        3
+        """
+        able = self._able(pegs)
+        if pegs & able == pegs:
+            # they can all move already
+            return pegs
+        reach = pegs
+        while True:
+            more = reach
+            for step, starts in self.steps:
+                more |= _shift(reach & starts & _shift(reach, -step),
+                               2 * step)
+            if more == reach:
+                return pegs & self._able(reach)
+            reach = more
+
+    def _able(self, reach):
+        """
+        Return the mask of the cells that could jump or be jumped over
+        on _Board self if the cells of reach held pegs.
+
+        @type self: _Board
+        @type reach: int
+        @rtype: int
+        """
+        able = 0
+        for step, starts in self.steps:
+            able |= starts & _shift(reach, -step)
+            able |= _shift(reach & starts, step)
+        return able
+
+
+def _shift(mask, step):
+    """
+    Return mask with every bit moved step places up, or down if step
+    is negative.
+
+    @type mask: int
+    @type step: int
+    @rtype: int
+
+    >>> _shift(0b110, -1), _shift(0b110, 2)
+    (3, 24)
+    """
+    return mask << step if step > 0 else mask >> -step
+
+
+@lru_cache(maxsize=None)
+def _board(rows, columns, holes):
+    """
+    Return the _Board of rows x columns cells with unused cells holes,
+    building each one only once.
+
+    @type rows: int
+    @type columns: int
+    @type holes: int
+    @rtype: _Board
+
+    >>> board = _board(1, 3, 0)
+    >>> board.jumps
+    [((3, 4, 7),), (), ((6, 1, 7),)]
+    >>> board is _board(1, 3, 0)
+    True
+    """
+    return _Board(rows, columns, holes)
 
-        count = 0
-        for row in marker:
-            for piece in row:
-                if piece == "*":
-                    count += 1
-        if count == 1:
-            return True
-        else:
-            return False
 
 if __name__ == "__main__":
     import doctest
 
     doctest.testmod()
-    from puzzle_tools import depth_first_solve
+    from puzzle_tools import depth_first_solve, SearchStats
 
     grid = [["*", "*", "*", "*", "*"],
             ["*", "*", "*", "*", "*"],
@@ -201,11 +647,10 @@ if __name__ == "__main__":
             ["*", "*", ".", "*", "*"],
             ["*", "*", "*", "*", "*"]]
     gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
-    gpsp.extensions()
-    import time
-
-    start = time.time()
-    solution = depth_first_solve(gpsp)
-    end = time.time()
-    print("Solved 5x5 peg solitaire in {} seconds.".format(end - start))
+    # for timings, run benchmark.py
+    stats = SearchStats()
+    solution = depth_first_solve(gpsp, stats=stats)
+    print("Solved 5x5 peg solitaire")
     print("Using depth-first: \n{}".format(solution))
+    print("Boards pruned by each rule of fail_fast: {}".format(
+        stats.fail_fast_reasons))
@@ -0,0 +1,202 @@
+"""
+Breadth-first search of MNPuzzles a whole layer at a time with numpy:
+a layer is a 2-D array with one row of packed cells per state, and
+every blank of the layer slides in one direction with a few vectorized
+operations.  MNPuzzles are only built again for the path returned.
+
+numpy is optional: this module imports without it, and its solver
+raises ImportError when called.
+"""
+from puzzle_tools import node_path, Search, PuzzleNode
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def batch_breadth_first_solve(puzzle, budget=None, stats=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution of MNPuzzle puzzle, like breadth_first_solve,
+    expanding each layer of the search as one numpy array.  Return None
+    if there is no solution, or a BudgetExceeded if budget runs out
+    first.  If stats is given, it is filled in as the search goes.
+
+    A new layer is deduplicated on packed keys of its rows, against
+    itself and the two layers before it, which finds every duplicate
+    since each move can be undone.  Only the puzzle itself is checked
+    with fail_fast, as the states in between are never MNPuzzles.
+
+    @type puzzle: MNPuzzle
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> from puzzle_tools import breadth_first_solve
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+    ...              (("1", "2", "3"), ("4", "5", "*")))
+    >>> str(batch_breadth_first_solve(p)) == str(breadth_first_solve(p))
+    True
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+    ...              (("2", "1", "3"), ("4", "5", "*")))
+    >>> batch_breadth_first_solve(p) is None
+    True
+    """
+    if numpy is None:
+        raise ImportError("batch_breadth_first_solve needs numpy")
+    search = Search(budget, stats)
+    try:
+        return _batch_search(puzzle, search)
+    finally:
+        search.finish()
+
+
+def _batch_search(puzzle, search):
+    """
+    Run batch_breadth_first_solve on puzzle with the bookkeeping of
+    Search search.
+
+    @type puzzle: MNPuzzle
+    @type search: Search
+    @rtype: PuzzleNode | BudgetExceeded | None
+    """
+    if search.is_solved(puzzle):
+        return PuzzleNode(puzzle)
+    if search.fail_fast(puzzle):
+        return None
+    layout = puzzle.layout
+    size = len(layout.goal)
+    pack = _packer(size, len(layout.symbols))
+    goal = pack(numpy.frombuffer(layout.goal, numpy.uint8).reshape(1, size))
+    neighbors = neighbor_table(layout.neighbors)
+    # every layer so far, as (rows, blanks, index of each row's parent
+    # in the layer before), and the packed keys of the last two
+    rows = numpy.frombuffer(puzzle.encode_state(),
+                            numpy.uint8).reshape(1, size)
+    layers = [(rows, numpy.array([puzzle.blank]), None)]
+    older, keys = pack(rows)[:0], pack(rows)
+    visited = 1
+    while len(rows):
+        exceeded = search.expand(None, visited, len(rows), len(rows))
+        if exceeded is not None:
+            return exceeded
+        children, blanks, parents = expand(rows, layers[-1][1], neighbors,
+                                           layout.index["*"])
+        search.stats.nodes_generated += len(children)
+        # keep the first of each distinct new state, in generation order
+        fresh, first = numpy.unique(pack(children), return_index=True)
+        new = ~(numpy.isin(fresh, keys) | numpy.isin(fresh, older))
+        search.stats.duplicates_pruned += len(children) - int(new.sum())
+        first = first[new]
+        order = numpy.argsort(first)
+        first, fresh = first[order], fresh[new][order]
+        rows = children[first]
+        layers.append((rows, blanks[first], parents[first]))
+        older, keys = keys, fresh
+        visited += len(rows)
+        found = numpy.flatnonzero(fresh == goal[0])
+        if len(found):
+            return _batch_path(puzzle, layers, int(found[0]))
+    return None
+
+
+def expand(rows, blanks, neighbors, blank):
+    """
+    Return every extension of the states in rows, whose empty spaces
+    are at the cells in blanks: their rows, the cells of their empty
+    spaces, and the index in rows of the state each came from.  The
+    extensions of each state are together, in the order of
+    MNPuzzle.extensions().
+
+    neighbors is the neighbor_table of the board, and blank the byte
+    of the empty space.
+
+    @type rows: numpy.ndarray
+    @type blanks: numpy.ndarray
+    @type neighbors: numpy.ndarray
+    @type blank: int
+    @rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+
+    >>> rows = numpy.array([[0, 1, 2, 3]], numpy.uint8)
+    >>> children, blanks, parents = expand(rows, numpy.array([0]),
+    ...                                    neighbor_table([(1, 2)]), 0)
+    >>> children.tolist(), blanks.tolist(), parents.tolist()
+    ([[1, 0, 2, 3], [2, 1, 0, 3]], [1, 2], [0, 0])
+    """
+    targets = neighbors[blanks]
+    parents, direction = numpy.nonzero(targets >= 0)
+    targets = targets[parents, direction]
+    children = rows[parents]
+    moved = numpy.arange(len(parents))
+    children[moved, blanks[parents]] = children[moved, targets]
+    children[moved, targets] = blank
+    return children, targets, parents
+
+
+def neighbor_table(neighbors):
+    """
+    Return the cells next to each cell of a board, from the tuples of
+    neighbours in an MNLayout, as an array with a row per cell and -1
+    where a cell has fewer than four neighbours.
+
+    @type neighbors: list[tuple[int]]
+    @rtype: numpy.ndarray
+
+    >>> neighbor_table([(1,), (0,)]).tolist()
+    [[1, -1, -1, -1], [0, -1, -1, -1]]
+    """
+    table = numpy.full((len(neighbors), 4), -1, numpy.intp)
+    for cell, around in enumerate(neighbors):
+        table[cell, :len(around)] = around
+    return table
+
+
+def _packer(size, symbols):
+    """
+    Return a function packing each row of an array of states with size
+    cells written in symbols symbols into one key: a uint64 of the
+    cells' bits side by side when they fit, and the row's bytes
+    otherwise.
+
+    @type size: int
+    @type symbols: int
+    @rtype: (numpy.ndarray) -> numpy.ndarray
+
+    >>> pack = _packer(3, 4)
+    >>> pack(numpy.array([[1, 2, 3], [3, 2, 1]], numpy.uint8)).tolist()
+    [57, 27]
+    """
+    bits = max(1, (symbols - 1).bit_length())
+    if bits * size <= 64:
+        shifts = numpy.arange(size, dtype=numpy.uint64) * numpy.uint64(bits)
+        # the fields do not overlap, so summing them ors them together
+        return lambda rows: (rows.astype(numpy.uint64) << shifts).sum(
+            axis=1, dtype=numpy.uint64)
+    key = numpy.dtype((numpy.void, size))
+    return lambda rows: numpy.ascontiguousarray(rows).view(key).ravel()
+
+
+def _batch_path(puzzle, layers, index):
+    """
+    Return the PuzzleNode path from puzzle to the state at index in the
+    last of layers, following each state's parent back a layer at a
+    time.
+
+    @type puzzle: MNPuzzle
+    @type layers: list[(numpy.ndarray, numpy.ndarray, numpy.ndarray)]
+    @type index: int
+    @rtype: PuzzleNode
+    """
+    states = []
+    for rows, _, parents in reversed(layers[1:]):
+        states.append(puzzle.decode_state(rows[index].tobytes()))
+        index = int(parents[index])
+    states.reverse()
+    return node_path([puzzle] + states)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
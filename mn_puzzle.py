@@ -1,11 +1,19 @@
 from puzzle import Puzzle
+from functools import lru_cache
 
 
 class MNPuzzle(Puzzle):
     """
     An nxm puzzle, like the 15-puzzle, which may be solved, unsolved,
     or even unsolvable.
+
+    The configuration is packed into bytes, one per cell in reading
+    order, each the index of the cell's symbol in a MNLayout shared by
+    every puzzle with the same shape, goal and symbols.  The position of
+    the empty space is kept alongside, so moves are a swap of two bytes.
     """
+    __slots__ = ("n", "m", "to_grid", "_layout", "_cells", "_blank",
+                 "_doomed")
 
     def __init__(self, from_grid, to_grid):
         """
@@ -23,7 +31,85 @@ class MNPuzzle(Puzzle):
         assert all([len(r) == len(from_grid[0]) for r in from_grid])
         assert all([len(r) == len(to_grid[0]) for r in to_grid])
         self.n, self.m = len(from_grid), len(from_grid[0])
-        self.from_grid, self.to_grid = from_grid, to_grid
+        self.to_grid = to_grid
+        to_grid = tuple(map(tuple, to_grid))
+        symbols = {"*"}.union(*from_grid, *to_grid)
+        self._layout = _layout(self.n, self.m, to_grid,
+                               tuple(sorted(symbols)))
+        index = self._layout.index
+        self._cells = bytes([index[c] for row in from_grid for c in row])
+        self._blank = self._cells.find(index["*"])
+        # whether to_grid is out of reach, once fail_fast knows
+        self._doomed = None
+
+    @property
+    def from_grid(self):
+        """
+        The current configuration of MNPuzzle self, as a tuple of rows.
+
+        @type self: MNPuzzle
+        @rtype: tuple[tuple[str]]
+        """
+        symbols, cells, m = self._layout.symbols, self._cells, self.m
+        return tuple(tuple(symbols[c] for c in cells[i:i + m])
+                     for i in range(0, len(cells), m))
+
+    @property
+    def layout(self):
+        """
+        The MNLayout MNPuzzle self shares with every puzzle of the same
+        shape, goal and symbols; encode_state() writes cells as indices
+        into its symbols.
+
+        @type self: MNPuzzle
+        @rtype: MNLayout
+
+        >>> p = MNPuzzle((("*", "2"), ("1", "3")), (("1", "2"), ("3", "*")))
+        >>> p.layout.symbols, p.layout.neighbors[0]
+        (('*', '1', '2', '3'), (1, 2))
+        """
+        return self._layout
+
+    @property
+    def blank(self):
+        """
+        The cell of the empty space of MNPuzzle self, counted in reading
+        order, or -1 if it has none.
+
+        @type self: MNPuzzle
+        @rtype: int
+
+        >>> MNPuzzle((("1", "2"), ("*", "3")), (("1", "2"), ("3", "*"))).blank
+        2
+        """
+        return self._blank
+
+    def _child(self, cells, blank):
+        """
+        Return the MNPuzzle with the goal and layout of MNPuzzle self in
+        configuration cells, with the empty space at index blank.  It is
+        reached from self, so it shares whether self can be solved.
+
+        @type self: MNPuzzle
+        @type cells: bytes
+        @type blank: int
+        @rtype: MNPuzzle
+        """
+        child = MNPuzzle.__new__(MNPuzzle)
+        child.n, child.m, child.to_grid = self.n, self.m, self.to_grid
+        child._layout, child._cells, child._blank = self._layout, cells, blank
+        child._doomed = self._doomed
+        return child
+
+    def __reduce__(self):
+        """
+        Return how to pickle MNPuzzle self: by its grids, so the layout
+        is looked up again rather than copied.
+
+        @type self: MNPuzzle
+        @rtype: tuple
+        """
+        return MNPuzzle, (self.from_grid, self.to_grid)
 
     def __eq__(self, other):
         """
@@ -47,8 +133,51 @@ class MNPuzzle(Puzzle):
         True
         """
 
+        if type(other) != type(self):
+            return False
+        if self._layout is other._layout:
+            return self._cells == other._cells
         return (self.from_grid == other.from_grid and self.to_grid == other.to_grid)
 
+    def __hash__(self):
+        """
+        Return a hash of MNPuzzle self consistent with __eq__.
+
+        @type self: MNPuzzle
+        @rtype: int
+        """
+        return hash(self._cells)
+
+    def state_key(self):
+        """
+        Return a hashable key for the current configuration of MNPuzzle self:
+        its packed cells.
+
+        @type self: MNPuzzle
+        @rtype: bytes
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> MNPuzzle(start_grid, target_grid).state_key()
+        b'\\x00\\x02\\x03\\x01\\x04\\x05'
+        """
+        return self._cells
+
+    def problem_key(self):
+        """
+        Return a key for the configuration and goal of MNPuzzle self.
+
+        @type self: MNPuzzle
+        @rtype: tuple[tuple[tuple[str]]]
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> p = MNPuzzle(start_grid, target_grid)
+        >>> p.problem_key() == (start_grid, target_grid)
+        True
+        """
+        return self.from_grid, self.to_grid
+
     def __str__(self):
 
         """
@@ -94,59 +223,237 @@ class MNPuzzle(Puzzle):
         @type self: MNPuzzle
         @rtype: list[MNPuzzle]
         """
+        return list(self.iter_extensions())
+
+    def iter_extensions(self, exclude=-1):
+        """
+        Yield the extensions of the current Puzzle configuration one at
+        a time, in the order of extensions(), leaving out the one that
+        slides the tile at cell index exclude, if any.
+
+        @type self: MNPuzzle
+        @type exclude: int
+        @rtype: iterator[MNPuzzle]
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> p = MNPuzzle(start_grid, target_grid)
+        >>> next(p.iter_extensions()).from_grid
+        (('2', '*', '3'), ('1', '4', '5'))
+        >>> list(p.iter_extensions()) == p.extensions()
+        True
+        """
+        cells, blank = self._cells, self._blank
+        if cells == self._layout.goal or blank < 0:
+            return
+        for target in self._layout.neighbors[blank]:
+            if target == exclude:
+                continue
+            swapped = bytearray(cells)
+            swapped[blank], swapped[target] = cells[target], cells[blank]
+            yield self._child(bytes(swapped), target)
+
+    def iter_extensions_from(self, parent):
+        """
+        Yield the extensions of MNPuzzle self, an extension of MNPuzzle
+        parent, but for the one sliding the tile straight back, which
+        is never built.
+
+        @type self: MNPuzzle
+        @type parent: MNPuzzle
+        @rtype: iterator[MNPuzzle]
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), target_grid)
+        >>> child = p.extensions()[0]
+        >>> len(child.extensions())
+        3
+        >>> [e.from_grid for e in child.iter_extensions_from(p)]
+        [(('2', '3', '*'), ('1', '4', '5')), (('2', '4', '3'), ('1', '*', '5'))]
+        """
+        return self.iter_extensions(parent._blank)
+
+    def encode_state(self):
+        """
+        Return the configuration of MNPuzzle self as one byte per cell:
+        the index of its symbol among the sorted symbols of the puzzle.
+
+        @type self: MNPuzzle
+        @rtype: bytes
 
-        start_tuple, target_tuple = self.from_grid, self.to_grid
-        row = len(start_tuple)-1
-        col = len(start_tuple[0])-1
-        ext_list = []
-
-        if self.is_solved():
-            return ext_list
-        for y in range(len(start_tuple)):
-            for x in range(len(start_tuple[0])):
-                if start_tuple[y][x] == "*":
-
-                    # right
-                    if (x+1) <= col:
-                        new_tuple = start_tuple
-                        new_tuple = list(new_tuple)
-                        new_tuple[y] = list(new_tuple[y])
-                        new_tuple[y][x], new_tuple[y][x+1] = new_tuple[y][x+1], "*"
-                        new_tuple[y] = tuple(new_tuple[y])
-                        new_tuple = tuple(new_tuple)
-                        ext_list.append(MNPuzzle(new_tuple,target_tuple))
-                    # left
-                    if (x-1) >= 0:
-                        new_tuple = start_tuple
-                        new_tuple = list(new_tuple)
-                        new_tuple[y] = list(new_tuple[y])
-                        new_tuple[y][x], new_tuple[y][x-1] = new_tuple[y][x-1], "*"
-                        new_tuple[y] = tuple(new_tuple[y])
-                        new_tuple = tuple(new_tuple)
-                        ext_list.append(MNPuzzle(new_tuple,target_tuple))
-                    # top
-                    if (y-1) >= 0:
-                        new_tuple = start_tuple
-                        new_tuple = list(new_tuple)
-                        new_tuple[y] = list(new_tuple[y])
-                        new_tuple[y-1] = list(new_tuple[y-1])
-                        new_tuple[y][x], new_tuple[y-1][x] = new_tuple[y-1][x], "*"
-                        new_tuple[y-1] = tuple(new_tuple[y-1])
-                        new_tuple[y] = tuple(new_tuple[y])
-                        new_tuple = tuple(new_tuple)
-                        ext_list.append(MNPuzzle(new_tuple,target_tuple))
-                    # bottom
-                    if (y+1) <= row:
-                        new_tuple = start_tuple
-                        new_tuple = list(new_tuple)
-                        new_tuple[y] = list(new_tuple[y])
-                        new_tuple[y+1] = list(new_tuple[y+1])
-                        new_tuple[y][x], new_tuple[y+1][x] = new_tuple[y+1][x], "*"
-                        new_tuple[y+1] = tuple(new_tuple[y+1])
-                        new_tuple[y] = tuple(new_tuple[y])
-                        new_tuple = tuple(new_tuple)
-                        ext_list.append(MNPuzzle(new_tuple,target_tuple))
-        return ext_list
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> p = MNPuzzle(start_grid, target_grid)
+        >>> p.decode_state(p.encode_state()) == p
+        True
+        """
+        return self._cells
+
+    def decode_state(self, data):
+        """
+        Return the MNPuzzle with the goal of MNPuzzle self whose
+        configuration encode_state turned into data.
+
+        @type self: MNPuzzle
+        @type data: bytes
+        @rtype: MNPuzzle
+        """
+        data = bytes(data)
+        child = self._child(data, data.find(self._layout.index["*"]))
+        # data need not be reachable from self
+        child._doomed = None
+        return child
+
+    def legal_moves(self, exclude=-1):
+        """
+        Return the moves of MNPuzzle self, in the order of extensions().
+        A move (blank, target) slides the tile at cell index target into
+        the empty space at cell index blank.  The move of the tile at
+        cell index exclude, if any, is left out.
+
+        @type self: MNPuzzle
+        @type exclude: int
+        @rtype: list[(int, int)]
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> MNPuzzle(start_grid, target_grid).legal_moves()
+        [(0, 1), (0, 3)]
+        """
+        blank = self._blank
+        if self._cells == self._layout.goal or blank < 0:
+            return []
+        return [(blank, target) for target in self._layout.neighbors[blank]
+                if target != exclude]
+
+    def legal_moves_after(self, move):
+        """
+        Return the moves of MNPuzzle self, just reached by move, but for
+        the one sliding the same tile straight back.
+
+        @type self: MNPuzzle
+        @type move: (int, int)
+        @rtype: list[(int, int)]
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), target_grid)
+        >>> p.apply_move((0, 3))
+        >>> p.legal_moves(), p.legal_moves_after((0, 3))
+        ([(3, 4), (3, 0)], [(3, 4)])
+        """
+        return self.legal_moves(move[0])
+
+    def apply_move(self, move):
+        """
+        Slide a tile of MNPuzzle self as move says.
+
+        @type self: MNPuzzle
+        @type move: (int, int)
+        @rtype: None
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> p = MNPuzzle(start_grid, target_grid)
+        >>> p.apply_move((0, 3))
+        >>> p.from_grid
+        (('1', '2', '3'), ('*', '4', '5'))
+        >>> p.undo_move((0, 3))
+        >>> p.from_grid == start_grid
+        True
+        """
+        blank, target = move
+        cells = bytearray(self._cells)
+        cells[blank], cells[target] = cells[target], cells[blank]
+        self._cells, self._blank = bytes(cells), target
+
+    def undo_move(self, move):
+        """
+        Slide back the tile that move slid in MNPuzzle self.
+
+        @type self: MNPuzzle
+        @type move: (int, int)
+        @rtype: None
+        """
+        blank, target = move
+        cells = bytearray(self._cells)
+        cells[blank], cells[target] = cells[target], cells[blank]
+        self._cells, self._blank = bytes(cells), blank
+
+    def copy(self):
+        """
+        Return a copy of MNPuzzle self.
+
+        @type self: MNPuzzle
+        @rtype: MNPuzzle
+        """
+        return self._child(self._cells, self._blank)
+
+    def fail_fast(self):
+        """
+        Return True iff MNPuzzle self can never reach to_grid: when its
+        tiles are not those of to_grid, or when, with every tile
+        distinct, the parity of the permutation taking self to to_grid
+        (the empty space included) differs from the parity of the
+        distance the empty space has to travel.  Each move flips both,
+        so they agree exactly on the configurations that can be
+        reached.  On even widths this is the usual rule counting
+        inversions and the row of the empty space.  On a board one row
+        or column wide, the tiles must already be in order.
+
+        The answer is worked out once and passed on to the extensions.
+
+        @type self: MNPuzzle
+        @rtype: bool
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+        ...          target_grid).fail_fast()
+        False
+        >>> MNPuzzle((("*", "3", "2"), ("1", "4", "5")),
+        ...          target_grid).fail_fast()
+        True
+        >>> MNPuzzle((("1", "*", "2"),), (("1", "2", "*"),)).fail_fast()
+        False
+        """
+        if self._doomed is None:
+            self._doomed = not _reachable(self._cells, self._layout.goal,
+                                          self.n, self.m,
+                                          self._layout.index["*"])
+        return self._doomed
+
+    def heuristic(self):
+        """
+        Return the sum of the Manhattan distances from each tile of
+        MNPuzzle self to its place in to_grid.  The blank is not counted,
+        so this never overestimates the number of moves left.
+
+        @type self: MNPuzzle
+        @rtype: int
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> MNPuzzle(start_grid, target_grid).heuristic()
+        3
+        >>> MNPuzzle(target_grid, target_grid).heuristic()
+        0
+        """
+        distances = self._layout.distances
+        return sum([distances[i][c] for i, c in enumerate(self._cells)])
+
+    def reversed(self):
+        """
+        Return the MNPuzzle from to_grid to from_grid of MNPuzzle self.
+
+        @type self: MNPuzzle
+        @rtype: MNPuzzle
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> w = MNPuzzle(start_grid, target_grid).reversed()
+        >>> w == MNPuzzle(target_grid, start_grid)
+        True
+        """
+        return MNPuzzle(self.to_grid, self.from_grid)
 
     def is_solved(self):
 
@@ -168,9 +475,114 @@ class MNPuzzle(Puzzle):
         True
         """
 
-        if self.from_grid == self.to_grid:
-            return True
+        return self._cells == self._layout.goal
+
+
+class MNLayout:
+    """
+    What every MNPuzzle with the same shape, goal and symbols shares:
+    the symbol behind each byte of a configuration, the goal, the cells
+    next to each cell, and a table of Manhattan distances to the goal.
+    """
+
+    def __init__(self, n, m, to_grid, symbols):
+        """
+        Create a new MNLayout self for nxm puzzles working towards
+        to_grid, with configurations written in symbols.
+
+        @type self: MNLayout
+        @type n: int
+        @type m: int
+        @type to_grid: tuple[tuple[str]]
+        @type symbols: tuple[str]
+        @rtype: None
+        """
+        self.symbols = symbols
+        self.index = {c: i for i, c in enumerate(symbols)}
+        self.goal = bytes([self.index[c] for row in to_grid for c in row])
+        # the neighbours of each cell: right, left, above, below
+        self.neighbors = []
+        for i in range(n * m):
+            y, x = divmod(i, m)
+            self.neighbors.append(tuple(
+                y2 * m + x2 for (y2, x2) in
+                ((y, x + 1), (y, x - 1), (y - 1, x), (y + 1, x))
+                if 0 <= y2 < n and 0 <= x2 < m))
+        # distances[i][c]: the fewest moves from cell i to a place of
+        # symbol c in to_grid; a repeated symbol may settle in any of
+        # its places, and the blank and symbols missing from to_grid
+        # count 0
+        goal = {}
+        for y, row in enumerate(to_grid):
+            for x, piece in enumerate(row):
+                goal.setdefault(piece, []).append((y, x))
+        self.distances = []
+        for i in range(n * m):
+            y, x = divmod(i, m)
+            self.distances.append([
+                0 if c == "*" or c not in goal else
+                min([abs(y - gy) + abs(x - gx) for (gy, gx) in goal[c]])
+                for c in symbols])
+
+
+def _reachable(cells, goal, n, m, blank):
+    """
+    Return whether the nxm configuration cells can be slid into goal,
+    both packed as in MNPuzzle, with blank the byte of the empty space.
+
+    @type cells: bytes
+    @type goal: bytes
+    @type n: int
+    @type m: int
+    @type blank: int
+    @rtype: bool
+
+    >>> _reachable(bytes([0, 1, 2, 3]), bytes([1, 2, 3, 0]), 2, 2, 0)
+    False
+    >>> _reachable(bytes([0, 1, 2, 3]), bytes([2, 1, 3, 0]), 2, 2, 0)
+    True
+    """
+    if sorted(cells) != sorted(goal):
         return False
+    if n == 1 or m == 1:
+        return cells.replace(bytes([blank]), b"") == goal.replace(
+            bytes([blank]), b"")
+    if len(set(goal)) < len(goal):
+        # swapping two equal tiles fixes the parity of any arrangement
+        return True
+    place = {c: i for i, c in enumerate(goal)}
+    # the parity of a permutation is that of its length less its cycles
+    seen, parity = bytearray(len(cells)), len(cells)
+    for i in range(len(cells)):
+        if not seen[i]:
+            parity -= 1
+            while not seen[i]:
+                seen[i] = 1
+                i = place[cells[i]]
+    (y, x), (gy, gx) = (divmod(cells.find(blank), m),
+                        divmod(goal.find(blank), m))
+    return parity % 2 == (abs(y - gy) + abs(x - gx)) % 2
+
+
+@lru_cache(maxsize=None)
+def _layout(n, m, to_grid, symbols):
+    """
+    Return the MNLayout of nxm puzzles working towards to_grid in
+    symbols, building each one only once.
+
+    @type n: int
+    @type m: int
+    @type to_grid: tuple[tuple[str]]
+    @type symbols: tuple[str]
+    @rtype: MNLayout
+
+    >>> layout = _layout(2, 2, (("1", "*"), ("1", "2")), ("*", "1", "2"))
+    >>> layout.goal, layout.neighbors[0]
+    (b'\\x01\\x00\\x01\\x02', (1, 2))
+    >>> layout is _layout(2, 2, (("1", "*"), ("1", "2")), ("*", "1", "2"))
+    True
+    """
+    return MNLayout(n, m, to_grid, symbols)
 
 
 if __name__ == "__main__":
@@ -179,17 +591,11 @@ if __name__ == "__main__":
     target_grid = (("1", "2", "3"), ("4", "5", "*"))
     start_grid = (("*", "2", "3"), ("1", "4", "5"))
     from puzzle_tools import breadth_first_solve, depth_first_solve
-    from time import time
-    start = time()
+    # for timings, run benchmark.py
     solution = breadth_first_solve(MNPuzzle(start_grid, target_grid))
-    end = time()
-    print("BFS solved: \n\n{} \n\nin {} seconds".format(
-        solution, end - start))
-    start = time()
+    print("BFS solved: \n\n{}".format(solution))
     solution = depth_first_solve((MNPuzzle(start_grid, target_grid)))
-    end = time()
-    print("DFS solved: \n\n{} \n\nin {} seconds".format(
-        solution, end - start))
+    print("DFS solved: \n\n{}".format(solution))
 
 
 
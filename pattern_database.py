@@ -0,0 +1,248 @@
+"""
+Disjoint pattern databases: admissible heuristics for MNPuzzle that are
+much stronger than Manhattan distance, precomputed into a file that is
+memory-mapped for lookups.
+
+    python pattern_database.py 4 4 fifteen.pdb --group-size 5
+
+builds one for the 4x4 goal with tiles "1" to "15" in reading order and
+the empty space last.  Pass it to a_star_solve or ida_star_solve as the
+heuristic:
+
+    database = PatternDatabase("fifteen.pdb")
+    a_star_solve(puzzle, heuristic=database)
+"""
+import argparse
+from collections import deque
+import json
+import mmap
+import struct
+
+MAGIC = b"MNPDB\x01"
+# entries for pattern placements no search reaches
+UNREACHED = 255
+
+
+def build_pattern_database(to_grid, path, groups=None, group_size=4):
+    """
+    Write to path a disjoint pattern database for MNPuzzles working
+    towards to_grid, and return it opened as a PatternDatabase.
+
+    The tiles of to_grid are split into groups, by default runs of
+    group_size tiles in reading order.  For each group, a backward
+    breadth-first search from the goal finds the fewest moves of the
+    group's own tiles that bring them home from every placement, moves
+    of other tiles being free.  The moves counted for different groups
+    are different moves, so the sum over groups never overestimates.
+
+    A group of k tiles on a board of N cells takes N ** k bytes on disk,
+    and building it searches up to N ** (k + 1) abstract states.  Every
+    symbol of to_grid other than "*" must appear once.
+
+    @type to_grid: tuple[tuple[str]]
+    @type path: str
+    @type groups: list[list[str]] | None
+    @type group_size: int
+    @rtype: PatternDatabase
+
+    >>> import os, tempfile
+    >>> goal = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+    >>> path = os.path.join(tempfile.mkdtemp(), "eight.pdb")
+    >>> database = build_pattern_database(goal, path)
+    >>> database.groups
+    [['1', '2', '3', '4'], ['5', '6', '7', '8']]
+    >>> os.path.getsize(path) - database.offsets[0]
+    13122
+    """
+    to_grid = tuple(tuple(row) for row in to_grid)
+    tiles = [c for row in to_grid for c in row if c != "*"]
+    if len(set(tiles)) != len(tiles):
+        raise ValueError("every tile of to_grid must be distinct")
+    if groups is None:
+        groups = [tiles[i:i + group_size]
+                  for i in range(0, len(tiles), group_size)]
+    if sorted(c for group in groups for c in group) != sorted(tiles):
+        raise ValueError("groups must split the tiles of to_grid")
+    n, m = len(to_grid), len(to_grid[0])
+    cells = [c for row in to_grid for c in row]
+    header = json.dumps({"n": n, "m": m, "to_grid": to_grid,
+                         "groups": groups}).encode()
+    with open(path, "wb") as output:
+        output.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for group in groups:
+            output.write(_group_table(n, m, [cells.index(c) for c in group],
+                                      cells.index("*")))
+    return PatternDatabase(path)
+
+
+def _group_table(n, m, homes, blank):
+    """
+    Return the table of one pattern group on an nxm board: for each
+    placement of its tiles, whose goal cells are homes, the fewest moves
+    of those tiles needed to bring them home with the empty space at
+    cell blank.  A placement of tile positions p[0], p[1], ... is stored
+    at index p[0] + p[1] * N + p[2] * N ** 2 + ..., for N cells.
+
+    @type n: int
+    @type m: int
+    @type homes: list[int]
+    @type blank: int
+    @rtype: bytearray
+
+    >>> list(_group_table(1, 2, [0], 1))
+    [0, 1]
+    """
+    size = n * m
+    k = len(homes)
+    weights = [size ** i for i in range(k)]
+    neighbors = []
+    for i in range(size):
+        y, x = divmod(i, m)
+        neighbors.append([y2 * m + x2 for (y2, x2) in
+                          ((y, x + 1), (y, x - 1), (y - 1, x), (y + 1, x))
+                          if 0 <= y2 < n and 0 <= x2 < m])
+    # 0-1 breadth-first search over (placement, empty cell): sliding a
+    # tile of the group costs a move, sliding any other tile costs none
+    distance = bytearray([UNREACHED]) * (size ** k * size)
+    start = sum(h * w for h, w in zip(homes, weights))
+    distance[start * size + blank] = 0
+    queue = deque([(start, blank, 0)])
+    while queue:
+        placement, empty, steps = queue.popleft()
+        if distance[placement * size + empty] < steps:
+            continue
+        # which tile of the group, if any, sits on each cell
+        owner, rest = {}, placement
+        for j in range(k):
+            rest, cell = divmod(rest, size)
+            owner[cell] = j
+        for cell in neighbors[empty]:
+            if cell in owner:
+                # the tile on cell slides into the empty space
+                moved = placement + (empty - cell) * weights[owner[cell]]
+                if steps + 1 < distance[moved * size + cell]:
+                    distance[moved * size + cell] = steps + 1
+                    queue.append((moved, cell, steps + 1))
+            elif steps < distance[placement * size + cell]:
+                distance[placement * size + cell] = steps
+                queue.appendleft((placement, cell, steps))
+    # the empty space is not part of the pattern: take the best of it
+    return bytearray(min(distance[i:i + size])
+                     for i in range(0, len(distance), size))
+
+
+class PatternDatabase:
+    """
+    A disjoint pattern database file, memory-mapped so that every
+    process using the same file shares one copy of its tables.
+
+    Call it on an MNPuzzle working towards its goal to get a lower bound
+    on the moves left.  Pickling reopens the file by name, so it can be
+    handed to worker processes.
+    """
+
+    def __init__(self, path):
+        """
+        Open the pattern database written by build_pattern_database to
+        path as a new PatternDatabase self.
+
+        @type self: PatternDatabase
+        @type path: str
+        @rtype: None
+        """
+        self.path = path
+        with open(path, "rb") as source:
+            self._data = mmap.mmap(source.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        if self._data[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not a pattern database".format(path))
+        start = len(MAGIC) + 4
+        length, = struct.unpack("<I", self._data[len(MAGIC):start])
+        header = json.loads(self._data[start:start + length].decode())
+        self.n, self.m = header["n"], header["m"]
+        self.to_grid = tuple(tuple(row) for row in header["to_grid"])
+        self.groups = header["groups"]
+        size = self.n * self.m
+        self._weights = [[size ** i for i in range(len(group))]
+                         for group in self.groups]
+        self.offsets = []
+        offset = start + length
+        for group in self.groups:
+            self.offsets.append(offset)
+            offset += size ** len(group)
+        # MNPuzzle.encode_state writes each cell as the index of its
+        # symbol among the sorted symbols of the puzzle
+        symbols = sorted({c for row in self.to_grid for c in row} | {"*"})
+        self._codes = [[symbols.index(c) for c in group]
+                       for group in self.groups]
+        self._symbols = len(symbols)
+        self._checked = None
+
+    def __call__(self, puzzle):
+        """
+        Return the sum over the groups of PatternDatabase self of the
+        moves their tiles need in MNPuzzle puzzle.
+
+        @type self: PatternDatabase
+        @type puzzle: MNPuzzle
+        @rtype: int
+
+        >>> import os, tempfile
+        >>> from mn_puzzle import MNPuzzle
+        >>> goal = (("1", "2", "3"), ("4", "5", "*"))
+        >>> database = build_pattern_database(
+        ...     goal, os.path.join(tempfile.mkdtemp(), "six.pdb"))
+        >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), goal)
+        >>> database(p), p.heuristic()
+        (3, 3)
+        >>> p = MNPuzzle((("4", "1", "2"), ("5", "*", "3")), goal)
+        >>> database(p) >= p.heuristic()
+        True
+        """
+        if puzzle.to_grid is not self._checked:
+            if tuple(map(tuple, puzzle.to_grid)) != self.to_grid:
+                raise ValueError("puzzle does not work towards the goal "
+                                 "of this pattern database")
+            self._checked = puzzle.to_grid
+        where = [0] * self._symbols
+        for cell, code in enumerate(puzzle.encode_state()):
+            where[code] = cell
+        data, total = self._data, 0
+        for offset, codes, weights in zip(self.offsets, self._codes,
+                                          self._weights):
+            total += data[offset + sum([where[c] * w for c, w
+                                        in zip(codes, weights)])]
+        return total
+
+    def close(self):
+        """
+        Unmap the file of PatternDatabase self.
+
+        @type self: PatternDatabase
+        @rtype: None
+        """
+        self._data.close()
+
+    def __reduce__(self):
+        """
+        Return how to pickle PatternDatabase self: by its path.
+
+        @type self: PatternDatabase
+        @rtype: tuple
+        """
+        return PatternDatabase, (self.path,)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("n", type=int, help="rows of the board")
+    parser.add_argument("m", type=int, help="columns of the board")
+    parser.add_argument("path", help="file to write the database to")
+    parser.add_argument("--group-size", type=int, default=4,
+                        help="tiles per pattern group")
+    args = parser.parse_args()
+    cells = [str(i) for i in range(1, args.n * args.m)] + ["*"]
+    build_pattern_database(
+        tuple(tuple(cells[r * args.m:(r + 1) * args.m])
+              for r in range(args.n)),
+        args.path, group_size=args.group_size)
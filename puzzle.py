@@ -3,6 +3,8 @@ class Puzzle:
     Snapshot of a full-information puzzle, which may be solved, unsolved,
     or even unsolvable.
     """
+    # no instance dict here, so subclasses may use __slots__
+    __slots__ = ()
 
     def fail_fast(self):
         """
@@ -16,6 +18,20 @@ class Puzzle:
         """
         return False
 
+    def fail_fast_reason(self):
+        """
+        Return the name of the rule by which Puzzle self can never be
+        extended to a solution, or None if fail_fast() is False.
+
+        Solvers call this to count their prunes by rule.  Override it,
+        and have fail_fast() call it, in a subclass that prunes by more
+        than one rule.
+
+        @type self: Puzzle
+        @rtype: str | None
+        """
+        return "fail_fast" if self.fail_fast() else None
+
     def is_solved(self):
         """
         Return True iff Puzzle self is solved.
@@ -30,7 +46,10 @@ class Puzzle:
 
     def extensions(self):
         """
-        Return list of legal extensions of Puzzle self.
+        Return list of legal extensions of Puzzle self.  They depend
+        only on the configuration of self, not on how it was reached;
+        solvers skip the way back with iter_extensions_from() or by
+        state key.
 
         This is an abstract method that must be implemented
         in a subclass.
@@ -39,3 +58,198 @@ class Puzzle:
         @rtype: list[Puzzle]
         """
         raise NotImplementedError
+
+    def iter_extensions(self):
+        """
+        Return an iterator over the legal extensions of Puzzle self,
+        in the order extensions() lists them.
+
+        Depth-first solvers often need only the first few extensions of
+        a puzzle, so override this in a subclass with a generator that
+        builds each extension only when it is asked for.
+
+        @type self: Puzzle
+        @rtype: iterator[Puzzle]
+        """
+        return iter(self.extensions())
+
+    def iter_extensions_from(self, parent):
+        """
+        Return an iterator over the extensions of Puzzle self, itself an
+        extension of Puzzle parent, in the order of iter_extensions().
+        The extension back to the configuration of parent may be left
+        out.
+
+        Solvers that know which puzzle self was reached from call this
+        rather than iter_extensions(), so override it in a subclass
+        that can skip the move straight back without building it.
+
+        @type self: Puzzle
+        @type parent: Puzzle
+        @rtype: iterator[Puzzle]
+        """
+        return self.iter_extensions()
+
+    def encode_state(self):
+        """
+        Return the configuration of Puzzle self as bytes, for solvers
+        that keep states on disk.  Every configuration reachable from
+        self must encode to bytes of the same length, and equal
+        configurations to equal bytes.
+
+        Override this and decode_state in a subclass whose states
+        should be searchable by external_breadth_first_solve.
+
+        @type self: Puzzle
+        @rtype: bytes
+        """
+        raise NotImplementedError
+
+    def decode_state(self, data):
+        """
+        Return the Puzzle posing the same problem as Puzzle self, in the
+        configuration that encode_state turned into data.
+
+        @type self: Puzzle
+        @type data: bytes
+        @rtype: Puzzle
+        """
+        raise NotImplementedError
+
+    def legal_moves(self):
+        """
+        Return a list of the moves that extend Puzzle self, in the order
+        of extensions().
+
+        Together with apply_move, undo_move and copy, this lets a solver
+        search by changing one puzzle in place instead of building every
+        extension.  A move is whatever apply_move and undo_move accept.
+        The list stays valid after any moves applied to self are undone.
+
+        Override these four methods in a subclass that supports moves.
+
+        @type self: Puzzle
+        @rtype: list[object]
+        """
+        raise NotImplementedError
+
+    def legal_moves_after(self, move):
+        """
+        Return the moves of Puzzle self, just reached by applying move,
+        in the order of legal_moves().  The move undoing move may be
+        left out; override this like iter_extensions_from.
+
+        @type self: Puzzle
+        @type move: object
+        @rtype: list[object]
+        """
+        return self.legal_moves()
+
+    def apply_move(self, move):
+        """
+        Change Puzzle self in place into its extension by move, one of
+        self.legal_moves().
+
+        @type self: Puzzle
+        @type move: object
+        @rtype: None
+        """
+        raise NotImplementedError
+
+    def undo_move(self, move):
+        """
+        Change Puzzle self in place back to the configuration it was in
+        before move, the last move applied to it.
+
+        @type self: Puzzle
+        @type move: object
+        @rtype: None
+        """
+        raise NotImplementedError
+
+    def copy(self):
+        """
+        Return a copy of Puzzle self that moves applied to either one
+        leave the other unchanged.
+
+        @type self: Puzzle
+        @rtype: Puzzle
+        """
+        raise NotImplementedError
+
+    def state_key(self):
+        """
+        Return a hashable key for the configuration of Puzzle self.
+
+        Puzzles that are equal must have equal keys, so solvers can
+        track visited configurations in a set or dict instead of a list.
+        Every puzzle explored in one search shares its goal (and any
+        other fixed data, like a word set), so the key only needs to
+        capture the part of the configuration that moves change.
+
+        This is an abstract method that must be implemented
+        in a subclass.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        raise NotImplementedError
+
+    def problem_key(self):
+        """
+        Return a key for the whole problem Puzzle self poses: its
+        configuration and everything that decides what counts as a
+        solution, like a goal or a word set.
+
+        Unlike state_key, this tells apart puzzles from different
+        searches, so solutions can be cached across them.  The key must
+        be built from tuples, strings and numbers, whose repr is the
+        same in every process.  The default, state_key(), is enough for
+        puzzles whose solved condition is fixed.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        return self.state_key()
+
+    def __hash__(self):
+        """
+        Return a hash of Puzzle self that is consistent with __eq__.
+
+        A subclass that overrides __eq__ must also define __hash__,
+        usually by returning hash(self.state_key()).
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        return hash(self.state_key())
+
+    def heuristic(self):
+        """
+        Return an estimate of the number of extensions needed to get
+        from Puzzle self to a solution.
+
+        Informed solvers like a_star_solve expand puzzles with the
+        smallest estimate first.  Override this in a subclass where you
+        can do better than 0; the estimate must never exceed the true
+        number of steps for those solvers to return shortest paths.
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        return 0
+
+    def reversed(self):
+        """
+        Return the Puzzle that starts from the solution of Puzzle self
+        and is solved in self's current configuration.
+
+        Override this in a subclass that has a single solved
+        configuration and moves that can be undone, to let
+        bidirectional_solve search from both ends.  The configurations
+        of the two puzzles must share state keys.
+
+        @type self: Puzzle
+        @rtype: Puzzle
+        """
+        raise NotImplementedError
@@ -0,0 +1,203 @@
+"""
+Seeded generators of puzzle instances of adjustable difficulty, for
+measuring how the solvers scale.  The same arguments, seed included,
+always produce the same puzzle.
+"""
+import os
+from random import Random
+
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+from mn_puzzle import MNPuzzle
+from sudoku_puzzle import SudokuPuzzle
+from word_ladder_puzzle import WordLadderPuzzle
+
+WORDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "words")
+SUDOKU_SYMBOLS = "123456789ABCDEFG"
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def mn_puzzle(n, m, depth, seed=None):
+    """
+    Return an nxm MNPuzzle made by sliding the blank depth random moves
+    away from the goal, never straight back, so the solution is at most
+    depth moves long.  The goal numbers the tiles from "1" in reading
+    order, with the blank "*" last.
+
+    @type n: int
+    @type m: int
+    @type depth: int
+    @type seed: int | None
+    @rtype: MNPuzzle
+
+    >>> p = mn_puzzle(2, 3, 0)
+    >>> p.from_grid == p.to_grid == (("1", "2", "3"), ("4", "5", "*"))
+    True
+    >>> mn_puzzle(3, 3, 20, seed=1) == mn_puzzle(3, 3, 20, seed=1)
+    True
+    >>> p = mn_puzzle(3, 3, 1, seed=1)
+    >>> p.is_solved()
+    False
+    >>> any(e.is_solved() for e in p.extensions())
+    True
+    """
+    rng = Random(seed)
+    cells = [str(i) for i in range(1, n * m)] + ["*"]
+    goal = tuple(tuple(cells[r * m:(r + 1) * m]) for r in range(n))
+    blank, previous = n * m - 1, None
+    for _ in range(depth):
+        row, column = divmod(blank, m)
+        moves = [blank + step for step, ok in ((-m, row > 0),
+                                               (m, row < n - 1),
+                                               (-1, column > 0),
+                                               (1, column < m - 1))
+                 if ok and blank + step != previous]
+        target = rng.choice(moves)
+        cells[blank], cells[target] = cells[target], cells[blank]
+        blank, previous = target, blank
+    return MNPuzzle(tuple(tuple(cells[r * m:(r + 1) * m]) for r in range(n)),
+                    goal)
+
+
+def peg_puzzle(rows, columns, pegs, seed=None):
+    """
+    Return a rows x columns GridPegSolitairePuzzle with pegs pegs that
+    can be played down to a single peg.  The board is built backwards:
+    starting from one peg, each step un-jumps a random peg.
+
+    Raise ValueError if no such board is found, e.g. when pegs is more
+    than the board holds.
+
+    @type rows: int
+    @type columns: int
+    @type pegs: int
+    @type seed: int | None
+    @rtype: GridPegSolitairePuzzle
+
+    >>> p = peg_puzzle(4, 4, 6, seed=3)
+    >>> str(p).count("*")
+    6
+    >>> str(p) == str(peg_puzzle(4, 4, 6, seed=3))
+    True
+    >>> peg_puzzle(1, 1, 1).is_solved()
+    True
+    """
+    rng = Random(seed)
+    steps = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    for _ in range(100):
+        board = [["."] * columns for _ in range(rows)]
+        board[rng.randrange(rows)][rng.randrange(columns)] = "*"
+        for _ in range(pegs - 1):
+            # a peg at (y, x) landed there by jumping from two cells
+            # away over the cell between, both now empty
+            unjumps = [(y, x, dy, dx)
+                       for y in range(rows) for x in range(columns)
+                       for dy, dx in steps
+                       if board[y][x] == "*" and
+                       0 <= y + 2 * dy < rows and 0 <= x + 2 * dx < columns
+                       and board[y + dy][x + dx] == "." and
+                       board[y + 2 * dy][x + 2 * dx] == "."]
+            if not unjumps:
+                break
+            y, x, dy, dx = rng.choice(unjumps)
+            board[y][x] = "."
+            board[y + dy][x + dx] = board[y + 2 * dy][x + 2 * dx] = "*"
+        else:
+            return GridPegSolitairePuzzle(board, {"*", ".", "#"})
+    raise ValueError("no {}x{} board with {} pegs".format(rows, columns,
+                                                          pegs))
+
+
+def sudoku_puzzle(n, clues, seed=None):
+    """
+    Return an nxn SudokuPuzzle with clues cells filled in from a random
+    complete grid, so it always has a solution (though not always a
+    unique one).  Symbols are drawn from SUDOKU_SYMBOLS, so n is at
+    most 16.
+
+    @type n: int
+    @type clues: int
+    @type seed: int | None
+    @rtype: SudokuPuzzle
+
+    >>> s = sudoku_puzzle(4, 16, seed=2)
+    >>> s.is_solved()
+    True
+    >>> s = sudoku_puzzle(9, 30, seed=2)
+    >>> sum(c != "*" for c in s.state_key())
+    30
+    >>> s == sudoku_puzzle(9, 30, seed=2)
+    True
+    """
+    assert 0 <= clues <= n * n <= len(SUDOKU_SYMBOLS) ** 2
+    rng = Random(seed)
+    base = round(n ** (1 / 2))
+    # a complete grid from the standard pattern, with rows inside a band,
+    # bands, columns inside a stack, stacks and symbols all shuffled
+    def shuffled(seq):
+        seq = list(seq)
+        rng.shuffle(seq)
+        return seq
+    rows = [b * base + r for b in shuffled(range(base))
+            for r in shuffled(range(base))]
+    columns = [s * base + c for s in shuffled(range(base))
+               for c in shuffled(range(base))]
+    symbols = shuffled(SUDOKU_SYMBOLS[:n])
+    grid = [symbols[(base * (r % base) + r // base + c) % n]
+            for r in rows for c in columns]
+    for i in rng.sample(range(n * n), n * n - clues):
+        grid[i] = "*"
+    return SudokuPuzzle(n, grid, set(symbols))
+
+
+def word_ladder_puzzle(distance, length=4, seed=None, words=WORDS):
+    """
+    Return a WordLadderPuzzle between two length-letter words from the
+    file words whose shortest ladder is distance steps long.
+
+    Raise ValueError if no such pair is found.
+
+    @type distance: int
+    @type length: int
+    @type seed: int | None
+    @type words: str
+    @rtype: WordLadderPuzzle
+
+    >>> w = word_ladder_puzzle(3, seed=1)
+    >>> w == word_ladder_puzzle(3, seed=1)
+    True
+    >>> from puzzle_tools import breadth_first_solve
+    >>> node, steps = breadth_first_solve(w), 0
+    >>> while node.children:
+    ...     node, steps = node.children[0], steps + 1
+    >>> steps
+    3
+    """
+    with open(words) as source:
+        word_set = set(source.read().split())
+    candidates = sorted(w for w in word_set
+                        if len(w) == length and w.isalpha() and w.islower())
+    rng = Random(seed)
+    rng.shuffle(candidates)
+    for start in candidates[:200]:
+        # breadth-first from start, one layer per step
+        seen, layer = {start}, [start]
+        for _ in range(distance):
+            following = []
+            for word in layer:
+                for i in range(length):
+                    for c in LETTERS:
+                        new = word[:i] + c + word[i + 1:]
+                        if new in word_set and new not in seen:
+                            seen.add(new)
+                            following.append(new)
+            layer = following
+        if layer:
+            return WordLadderPuzzle(start, rng.choice(sorted(layer)),
+                                    word_set)
+    raise ValueError("no {}-letter ladder of {} steps".format(length,
+                                                              distance))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
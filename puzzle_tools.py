@@ -199,141 +199,1789 @@
 """
 Some functions for working with puzzles
 """
-from puzzle import Puzzle
 from collections import deque
-# set higher recursion limit
-# which is needed in PuzzleNode.__str__
-# uncomment the next two lines on a unix platform, say CDF
-# import resource
-# resource.setrlimit(resource.RLIMIT_STACK, (2**29, -1))
-import sys
-sys.setrecursionlimit(10**6)
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from heapq import heappush, heappop
+from itertools import count, islice
+import mmap
+import multiprocessing
+import os
+import tempfile
+import time
+from zlib import crc32
 
 
-def depth_first_solve(puzzle):
+def depth_first_solve(puzzle, budget=None, stats=None):
     """
     Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
     a solution, with each child containing an extension of the puzzle
-    in its parent.  Return None if this is not possible.
+    in its parent.  Return None if this is not possible, or a
+    BudgetExceeded if budget runs out first.  If stats is given, it is
+    filled in as the search goes.
+
+    The search uses an explicit stack of extension iterators rather
+    than recursion, so its depth is not limited by the C stack.
 
     @type puzzle: Puzzle
-    @rtype: PuzzleNode
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+    ...              (("1", "2", "3"), ("4", "5", "*")))
+    >>> path = list(depth_first_solve(p).puzzles())
+    >>> path[0] == p, path[-1].is_solved()
+    (True, True)
+    >>> all(b in a.extensions() for a, b in zip(path, path[1:]))
+    True
 
+    This path is far deeper than the recursion limit:
+
+    >>> import sys
+    >>> p = MNPuzzle((("4", "1", "3"), ("7", "2", "6"), ("5", "8", "*")),
+    ...              (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*")))
+    >>> len(list(depth_first_solve(p).puzzles())) > sys.getrecursionlimit()
+    True
     """
-    if puzzle.is_solved():
-        return PuzzleNode(puzzle)
+    search = Search(budget, stats)
+    try:
+        if search.is_solved(puzzle):
+            return PuzzleNode(puzzle)
 
-    else:
-        list_of_ext = puzzle.extensions()
-        visited = []
-        for puzzles in list_of_ext:
-            if puzzles not in visited:
-                visited.append(puzzles)
-                node = solve(puzzles,visited, PuzzleNode(puzzle))
+        # map each visited state key to the puzzle it was reached from
+        parents = {search.key(puzzle): None}
+        exceeded = search.expand(puzzle, len(parents), 1)
+        if exceeded is not None:
+            return exceeded
+        stack = [(puzzle, search.iter_extensions(puzzle))]
+        while stack:
+            parent, extensions = stack[-1]
+            for ext in extensions:
+                key = search.key(ext)
+                if key in parents:
+                    search.stats.duplicates_pruned += 1
+                    continue
+                parents[key] = parent
+                if search.is_solved(ext):
+                    return _path_to(ext, parents)
+                elif not search.fail_fast(ext):
+                    exceeded = search.expand(ext, len(parents),
+                                             len(stack) + 1)
+                    if exceeded is not None:
+                        return exceeded
+                    stack.append((ext, search.iter_extensions(ext,
+                                                              parent)))
+                    break
+            else:
+                # every extension of parent has been explored
+                stack.pop()
+        return None
+    finally:
+        search.finish()
+
+
+def in_place_depth_first_solve(puzzle, budget=None, stats=None):
+    """
+    Return the path depth_first_solve returns for puzzle, or None, or a
+    BudgetExceeded if budget runs out first.  If stats is given, it is
+    filled in as the search goes.
 
-                if node is not None:
-                    head = PuzzleNode(puzzle, [node], None)
-                    return head
+    Instead of building every extension, the search applies and undoes
+    moves on a single copy of puzzle, so puzzle must support
+    legal_moves(), apply_move(), undo_move() and copy().  Puzzles are
+    only copied for the path returned.  Since the working copy keeps
+    changing, an on_expand hook must not hold on to the puzzle it is
+    given.
 
+    @type puzzle: Puzzle
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | BudgetExceeded | None
 
-def solve(puzzle,visited, parent=None):
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> grid = ["*", "B", "C", "D"]
+    >>> grid += ["C", "D", "*", "B"]
+    >>> grid += ["B", "A", "D", "C"]
+    >>> grid += ["D", "C", "B", "*"]
+    >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+    >>> str(in_place_depth_first_solve(s)) == str(depth_first_solve(s))
+    True
+    >>> s.state_key() == tuple(grid)
+    True
     """
-    Return the child PuzzleNode
+    search = Search(budget, stats)
+    try:
+        if search.is_solved(puzzle):
+            return PuzzleNode(puzzle)
+
+        work = puzzle.copy()
+        visited = {search.key(work)}
+        exceeded = search.expand(work, len(visited), 1)
+        if exceeded is not None:
+            return exceeded
+        # the moves applied to work, and the moves left to try after
+        # each of them (after none of them, for the first)
+        applied, stack = [], [iter(search.legal_moves(work))]
+        while stack:
+            for move in stack[-1]:
+                work.apply_move(move)
+                key = search.key(work)
+                if key in visited:
+                    search.stats.duplicates_pruned += 1
+                elif search.is_solved(work):
+                    applied.append(move)
+                    return _replay_moves(puzzle, applied)
+                else:
+                    visited.add(key)
+                    if not search.fail_fast(work):
+                        exceeded = search.expand(work, len(visited),
+                                                 len(stack) + 1)
+                        if exceeded is not None:
+                            return exceeded
+                        applied.append(move)
+                        stack.append(iter(search.legal_moves(work, move)))
+                        break
+                work.undo_move(move)
+            else:
+                # every move from here has been explored
+                stack.pop()
+                if applied:
+                    work.undo_move(applied.pop())
+        return None
+    finally:
+        search.finish()
+
+
+def _legal_moves(puzzle, move):
+    """
+    Return the moves of puzzle, leaving out the one undoing move if
+    puzzle was just reached by move.
+
+    @type puzzle: Puzzle
+    @type move: object | None
+    @rtype: list[object]
+    """
+    if move is None:
+        return puzzle.legal_moves()
+    return puzzle.legal_moves_after(move)
+
+
+def _replay_moves(puzzle, moves):
+    """
+    Return the PuzzleNode path from puzzle through the copies of puzzle
+    that each move in moves leads to in turn.
+
     @type puzzle: Puzzle
-    @type l: list
-    @type parent: PuzzleNode
+    @type moves: list[object]
     @rtype: PuzzleNode
     """
-    if puzzle.is_solved():
-        return PuzzleNode(puzzle, [], parent)
+    path = [puzzle]
+    for move in moves:
+        path.append(path[-1].copy())
+        path[-1].apply_move(move)
+    return node_path(path)
 
-    elif puzzle.fail_fast():
+
+def breadth_first_solve(puzzle, budget=None, stats=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child PuzzleNode containing an extension
+    of the puzzle in its parent.  Return None if this is not possible,
+    or a BudgetExceeded if budget runs out first.  If stats is given,
+    it is filled in as the search goes.
+
+    @type puzzle: Puzzle
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    The path is a shortest one:
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+    ...              (("1", "2", "3"), ("4", "5", "*")))
+    >>> for q in breadth_first_solve(p).puzzles():
+    ...     print(q.from_grid)
+    (('*', '2', '3'), ('1', '4', '5'))
+    (('1', '2', '3'), ('*', '4', '5'))
+    (('1', '2', '3'), ('4', '*', '5'))
+    (('1', '2', '3'), ('4', '5', '*'))
+    """
+    search = Search(budget, stats)
+    try:
+        if search.is_solved(puzzle):
+            return PuzzleNode(puzzle)
+
+        # map each visited state key to the puzzle it was reached from
+        parents = {search.key(puzzle): None}
+        queue = deque([puzzle])
+        while queue:
+            parent = queue.popleft()
+            if search.fail_fast(parent):
+                continue
+            exceeded = search.expand(parent, len(parents), len(queue) + 1)
+            if exceeded is not None:
+                return exceeded
+            for ext in search.extensions(parent):
+                key = search.key(ext)
+                if key in parents:
+                    search.stats.duplicates_pruned += 1
+                    continue
+                parents[key] = parent
+                if search.is_solved(ext):
+                    return _path_to(ext, parents)
+                queue.append(ext)
         return None
+    finally:
+        search.finish()
+
 
+def iter_solutions(puzzle, strategy="depth_first", limit=None,
+                   budget=None, stats=None):
+    """
+    Return an iterator over paths from PuzzleNode(puzzle) to PuzzleNodes
+    containing solutions, each shaped like the result of
+    depth_first_solve.  Paths are found lazily as the iterator is
+    consumed, and at most limit of them are produced if limit is given.
+    If budget runs out, a BudgetExceeded is produced and the iterator
+    stops.  If stats is given, it is filled in as the search goes.
+
+    With strategy "depth_first", every solved configuration reachable
+    from puzzle is produced once, along the path depth-first search
+    first reached it by.  With strategy "breadth_first", every shortest
+    path to each solved configuration is produced, nearest
+    configurations first.  Solved configurations are never extended.
+
+    @type puzzle: Puzzle
+    @type strategy: str
+    @type limit: int | None
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @rtype: iterator[PuzzleNode | BudgetExceeded]
+
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> s = SudokuPuzzle(4, ["*"] * 16, {"A", "B", "C", "D"})
+    >>> sum(1 for _ in iter_solutions(s))
+    288
+    >>> len(list(iter_solutions(s, limit=5)))
+    5
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> w = WordLadderPuzzle("cat", "dog",
+    ...                      {"cat", "cot", "cag", "cog", "dot", "dog"})
+    >>> for path in sorted(" ".join(str(p).split()[0] for p in r.puzzles())
+    ...                    for r in iter_solutions(w, "breadth_first")):
+    ...     print(path)
+    cat cag cog dog
+    cat cot cog dog
+    cat cot dot dog
+    """
+    if strategy == "depth_first":
+        solutions = _iter_depth_first(puzzle, Search(budget, stats))
+    elif strategy == "breadth_first":
+        solutions = _iter_breadth_first(puzzle, Search(budget, stats))
     else:
-        lst_of_ext = puzzle.extensions()
+        raise ValueError("unknown strategy {!r}".format(strategy))
+    return solutions if limit is None else islice(solutions, limit)
 
-        for puzzles in lst_of_ext:
 
-            if puzzles not in visited:
-                visited.append(puzzles)
-                nodes = solve(puzzles,visited, PuzzleNode(puzzle))
+def _iter_depth_first(puzzle, search):
+    """
+    Yield a path to every solved configuration reachable from puzzle,
+    in depth-first order.
+
+    @type puzzle: Puzzle
+    @type search: Search
+    @rtype: iterator[PuzzleNode | BudgetExceeded]
+    """
+    try:
+        if search.is_solved(puzzle):
+            yield PuzzleNode(puzzle)
+            return
+
+        parents = {search.key(puzzle): None}
+        exceeded = search.expand(puzzle, len(parents), 1)
+        if exceeded is not None:
+            yield exceeded
+            return
+        stack = [(puzzle, search.iter_extensions(puzzle))]
+        while stack:
+            parent, extensions = stack[-1]
+            for ext in extensions:
+                key = search.key(ext)
+                if key in parents:
+                    search.stats.duplicates_pruned += 1
+                    continue
+                parents[key] = parent
+                if search.is_solved(ext):
+                    yield _path_to(ext, parents)
+                elif not search.fail_fast(ext):
+                    exceeded = search.expand(ext, len(parents),
+                                             len(stack) + 1)
+                    if exceeded is not None:
+                        yield exceeded
+                        return
+                    stack.append((ext, search.iter_extensions(ext,
+                                                              parent)))
+                    break
+            else:
+                stack.pop()
+    finally:
+        search.finish()
 
-                if nodes is not None:
-                    head = PuzzleNode(puzzle, [nodes], parent)
-                    nodes.parent = head
-                    return head
+
+def _iter_breadth_first(puzzle, search):
+    """
+    Yield every shortest path to each solved configuration reachable
+    from puzzle, one breadth-first layer at a time.
+
+    @type puzzle: Puzzle
+    @type search: Search
+    @rtype: iterator[PuzzleNode | BudgetExceeded]
+    """
+    try:
+        if search.is_solved(puzzle):
+            yield PuzzleNode(puzzle)
+            return
+
+        # map each state key to its layer and to every puzzle in the
+        # layer before it that extends to it
+        depth = {search.key(puzzle): 0}
+        parents = {search.key(puzzle): []}
+        layer, d = [puzzle], 0
+        while layer:
+            next_layer, solved = [], []
+            for parent in layer:
+                if search.fail_fast(parent):
+                    continue
+                exceeded = search.expand(parent, len(depth),
+                                         len(layer) + len(next_layer))
+                if exceeded is not None:
+                    yield exceeded
+                    return
+                for ext in search.extensions(parent):
+                    key = search.key(ext)
+                    if key not in depth:
+                        depth[key], parents[key] = d + 1, [parent]
+                        if search.is_solved(ext):
+                            solved.append(ext)
+                        else:
+                            next_layer.append(ext)
+                    elif depth[key] == d + 1:
+                        parents[key].append(parent)
+                    else:
+                        search.stats.duplicates_pruned += 1
+            # the parents of this layer are only complete once it is built
+            for ext in solved:
+                for path in _iter_paths_to(ext, parents):
+                    yield path
+            layer, d = next_layer, d + 1
+    finally:
+        search.finish()
+
+
+def _iter_paths_to(puzzle, parents):
+    """
+    Yield a PuzzleNode path for every way back from puzzle to the root
+    of a search through the parent lists in parents.
+
+    @type puzzle: Puzzle
+    @type parents: dict[object, list[Puzzle]]
+    @rtype: iterator[PuzzleNode]
+    """
+    # each partial path runs backwards from puzzle
+    stack = [[puzzle]]
+    while stack:
+        partial = stack.pop()
+        before = parents[partial[-1].state_key()]
+        if not before:
+            yield node_path(partial[::-1])
+        for parent in reversed(before):
+            stack.append(partial + [parent])
+
+
+def a_star_solve(puzzle, budget=None, stats=None, heuristic=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, with each child PuzzleNode containing an
+    extension of the puzzle in its parent.  Return None if this is not
+    possible, or a BudgetExceeded if budget runs out first.  If stats
+    is given, it is filled in as the search goes.
+
+    Puzzles are expanded in order of steps taken plus heuristic(puzzle),
+    by default Puzzle.heuristic(), so the path is shortest whenever the
+    heuristic never overestimates.
+
+    @type puzzle: Puzzle
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @type heuristic: (Puzzle) -> int | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> goal = (("1", "2", "3"), ("4", "5", "*"))
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), goal)
+    >>> len(list(a_star_solve(p).puzzles()))
+    4
+    >>> len(list(breadth_first_solve(p).puzzles()))
+    4
+    >>> a_star_solve(MNPuzzle((("*", "2", "3"), ("1", "5", "4")), goal)) is None
+    True
+    """
+    search = Search(budget, stats)
+    heuristic = heuristic or _own_heuristic
+    try:
+        # map each state key to the fewest steps it has been reached in,
+        # and the puzzle it was reached from along those steps
+        best_g = {search.key(puzzle): 0}
+        parents = {search.key(puzzle): None}
+        # ties on f are broken by insertion order, never by comparing
+        # puzzles
+        tie = count()
+        heap = [(heuristic(puzzle), next(tie), 0, puzzle)]
+        while heap:
+            _, _, g, current = heappop(heap)
+            if g > best_g[search.key(current)]:
+                # stale entry: current was reached more cheaply since
+                continue
+            if search.is_solved(current):
+                return _path_to(current, parents)
+            if search.fail_fast(current):
+                continue
+            exceeded = search.expand(current, len(best_g), len(heap) + 1)
+            if exceeded is not None:
+                return exceeded
+            for ext in search.extensions(current):
+                key = search.key(ext)
+                if key not in best_g or g + 1 < best_g[key]:
+                    best_g[key] = g + 1
+                    parents[key] = current
+                    heappush(heap, (g + 1 + heuristic(ext), next(tie),
+                                    g + 1, ext))
+                else:
+                    search.stats.duplicates_pruned += 1
         return None
+    finally:
+        search.finish()
 
 
-def breadth_first_solve(puzzle):
+def ida_star_solve(puzzle, report=None, budget=None, stats=None,
+                   heuristic=None):
     """
-    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
-    a solution, with each child PuzzleNode containing an extension
-    of the puzzle in its parent.  Return None if this is not possible.
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, with each child PuzzleNode containing an
+    extension of the puzzle in its parent.  Return None if this is not
+    possible, or a BudgetExceeded if budget runs out first.  If stats
+    is given, it is filled in as the search goes.
+
+    Iterative-deepening A*: repeat a depth-first search that cuts off
+    puzzles whose steps taken plus heuristic(puzzle), by default
+    Puzzle.heuristic(), exceed a bound, raising the bound to the
+    smallest value cut off each time.  Only
+    the current path is kept, so memory grows with the solution depth
+    rather than with the number of states explored.
+
+    If report is a list, a (bound, nodes expanded) tuple is appended to
+    it for every iteration.
+
+    @type puzzle: Puzzle
+    @type report: list[(int, int)] | None
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @type heuristic: (Puzzle) -> int | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> p = MNPuzzle((("4", "1", "3"), ("7", "2", "6"), ("5", "8", "*")),
+    ...              (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*")))
+    >>> report = []
+    >>> len(list(ida_star_solve(p, report).puzzles()))
+    9
+    >>> len(list(breadth_first_solve(p).puzzles()))
+    9
+    >>> report
+    [(6, 1), (8, 8)]
+    """
+    search = Search(budget, stats)
+    heuristic = heuristic or _own_heuristic
+    try:
+        if search.is_solved(puzzle):
+            return PuzzleNode(puzzle)
+        if search.fail_fast(puzzle):
+            return None
+
+        bound = heuristic(puzzle)
+        while True:
+            expanded, next_bound = 1, None
+            path, on_path = [puzzle], {search.key(puzzle)}
+            exceeded = search.expand(puzzle, len(on_path), 1)
+            if exceeded is not None:
+                return exceeded
+            stack = [search.iter_extensions(puzzle)]
+            while stack:
+                for ext in stack[-1]:
+                    key = search.key(ext)
+                    if key in on_path:
+                        search.stats.duplicates_pruned += 1
+                        continue
+                    # ext is len(path) steps from puzzle
+                    f = len(path) + heuristic(ext)
+                    if f > bound:
+                        if next_bound is None or f < next_bound:
+                            next_bound = f
+                    elif search.is_solved(ext):
+                        if report is not None:
+                            report.append((bound, expanded))
+                        return node_path(path + [ext])
+                    elif not search.fail_fast(ext):
+                        exceeded = search.expand(ext, len(on_path) + 1,
+                                                 len(stack) + 1)
+                        if exceeded is not None:
+                            return exceeded
+                        stack.append(search.iter_extensions(ext,
+                                                            path[-1]))
+                        path.append(ext)
+                        on_path.add(key)
+                        expanded += 1
+                        break
+                else:
+                    # every extension of path[-1] within bound is explored
+                    stack.pop()
+                    on_path.discard(path.pop().state_key())
+            if report is not None:
+                report.append((bound, expanded))
+            if next_bound is None:
+                return None
+            bound = next_bound
+    finally:
+        search.finish()
+
+
+def _own_heuristic(puzzle):
+    """
+    Return puzzle.heuristic(), the estimate informed solvers use unless
+    they are given another.
+
+    @type puzzle: Puzzle
+    @rtype: int
+    """
+    return puzzle.heuristic()
+
+
+def bidirectional_solve(puzzle, budget=None, stats=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, with each child PuzzleNode containing an
+    extension of the puzzle in its parent.  Return None if this is not
+    possible, or a BudgetExceeded if budget runs out first.  If stats
+    is given, it is filled in as the search goes.
+
+    Breadth-first search runs forward from puzzle and backward from
+    puzzle.reversed(), always growing the smaller frontier by a whole
+    layer, until the two meet on a shared state key.  This only works
+    for puzzles that implement Puzzle.reversed().
+
+    @type puzzle: Puzzle
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> goal = (("1", "2", "3"), ("4", "5", "*"))
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), goal)
+    >>> path = list(bidirectional_solve(p).puzzles())
+    >>> path[0] == p, path[-1].is_solved()
+    (True, True)
+    >>> len(path) == len(list(breadth_first_solve(p).puzzles()))
+    True
+    >>> bidirectional_solve(MNPuzzle((("*", "2", "3"), ("1", "5", "4")),
+    ...                              goal)) is None
+    True
+    """
+    search = Search(budget, stats)
+    try:
+        if search.is_solved(puzzle):
+            return PuzzleNode(puzzle)
+
+        goal = puzzle.reversed()
+        # map each state key reached from either end to its parent's key
+        forward = {search.key(puzzle): None}
+        backward = {search.key(goal): None}
+        forward_layer, backward_layer = [puzzle], [goal]
+        while forward_layer and backward_layer:
+            if len(forward_layer) <= len(backward_layer):
+                forward_layer, meet, exceeded = _expand_layer(
+                    forward_layer, forward, backward, len(backward_layer),
+                    search)
+            else:
+                backward_layer, meet, exceeded = _expand_layer(
+                    backward_layer, backward, forward, len(forward_layer),
+                    search)
+            if exceeded is not None:
+                return exceeded
+            if meet is not None:
+                # replay the forward half from puzzle, then step through
+                # the backward half towards the solution
+                keys = _chain_of_keys(meet, forward)
+                keys.reverse()
+                keys.extend(_chain_of_keys(meet, backward)[1:])
+                return node_path(_follow_keys(puzzle, keys[1:]))
+        return None
+    finally:
+        search.finish()
+
+
+def _expand_layer(layer, parents, others, waiting, search):
+    """
+    Return the next breadth-first layer after list layer, recording the
+    parent key of each new state key in parents, together with the first
+    new state key that is also in others (or None if there is none) and
+    a BudgetExceeded if search ran out of budget (or None).  The other
+    end of the search has waiting puzzles in its frontier.
+
+    @type layer: list[Puzzle]
+    @type parents: dict[object, object]
+    @type others: dict[object, object]
+    @type waiting: int
+    @type search: Search
+    @rtype: (list[Puzzle], object, BudgetExceeded | None)
+    """
+    next_layer = []
+    for parent in layer:
+        if search.fail_fast(parent):
+            continue
+        exceeded = search.expand(parent, len(parents) + len(others),
+                                 len(layer) + len(next_layer) + waiting)
+        if exceeded is not None:
+            return next_layer, None, exceeded
+        parent_key = search.key(parent)
+        for ext in search.extensions(parent):
+            key = search.key(ext)
+            if key in parents:
+                search.stats.duplicates_pruned += 1
+                continue
+            parents[key] = parent_key
+            if key in others:
+                return next_layer, key, None
+            next_layer.append(ext)
+    return next_layer, None, None
+
+
+def _chain_of_keys(key, parents):
+    """
+    Return the list of state keys from key back to the root of parents.
+
+    @type key: object
+    @type parents: dict[object, object]
+    @rtype: list[object]
+    """
+    keys = [key]
+    while parents[key] is not None:
+        key = parents[key]
+        keys.append(key)
+    return keys
+
+
+def _follow_keys(puzzle, keys):
+    """
+    Return a list of puzzles starting with puzzle, where each next
+    puzzle is the extension of the one before it whose state key is the
+    next key in keys.
 
     @type puzzle: Puzzle
+    @type keys: list[object]
+    @rtype: list[Puzzle]
+    """
+    path = [puzzle]
+    for key in keys:
+        for ext in path[-1].iter_extensions():
+            if ext.state_key() == key:
+                path.append(ext)
+                break
+        else:
+            raise ValueError("no extension of {} has state key {}".format(
+                path[-1], key))
+    return path
+
+
+def path_from_keys(puzzle, keys):
+    """
+    Return the PuzzleNode path from puzzle through the extensions whose
+    state keys are keys, in order: a solution stored as its state keys,
+    replayed into fresh puzzles.  Raise ValueError if some step has no
+    extension with the next key.
+
+    @type puzzle: Puzzle
+    @type keys: list[object]
     @rtype: PuzzleNode
 
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> w = WordLadderPuzzle("sad", "bat", {"sad", "bad", "bat"})
+    >>> print(path_from_keys(w, ["bad", "bat"]).children[0].puzzle)
+    bad --> bat
     """
-    if puzzle.is_solved():
+    return node_path(_follow_keys(puzzle, keys))
+
+
+def external_breadth_first_solve(puzzle, directory=None, buckets=16,
+                                 budget=None, stats=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, like breadth_first_solve, but keeping the
+    states of the search on disk rather than in memory.  Return None if
+    there is no solution, or a BudgetExceeded if budget runs out first.
+    If stats is given, it is filled in as the search goes.
+
+    Each layer of the search is written as records of a child state and
+    its parent, encoded by Puzzle.encode_state, into buckets files
+    chosen by a hash of the child, under directory (by default a
+    temporary directory, removed afterwards).  A new layer is
+    deduplicated one bucket at a time against the same bucket of the
+    two layers before it, so memory holds one bucket of one layer.
+    That finds every duplicate when each move can be undone, as in MN
+    puzzles and word ladders, or when the layer of a state is fixed by
+    the state, as in peg solitaire.  Layers are read back through mmap,
+    and the path is recovered from the parent states of earlier layers.
+    The visited count checked against budget is the number of states
+    written to disk.
+
+    @type puzzle: Puzzle
+    @type directory: str | None
+    @type buckets: int
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+    ...              (("1", "2", "3"), ("4", "5", "*")))
+    >>> str(external_breadth_first_solve(p)) == str(breadth_first_solve(p))
+    True
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+    ...              (("2", "1", "3"), ("4", "5", "*")))
+    >>> external_breadth_first_solve(p, buckets=4) is None
+    True
+    """
+    search = Search(budget, stats)
+    with tempfile.TemporaryDirectory(dir=directory) as root:
+        try:
+            return _external_search(puzzle, root, buckets, search)
+        finally:
+            search.finish()
+
+
+def _external_search(puzzle, root, buckets, search):
+    """
+    Run external_breadth_first_solve on puzzle with its layers in
+    directory root and the bookkeeping of Search search.
+
+    @type puzzle: Puzzle
+    @type root: str
+    @type buckets: int
+    @type search: Search
+    @rtype: PuzzleNode | BudgetExceeded | None
+    """
+    if search.is_solved(puzzle):
         return PuzzleNode(puzzle)
 
+    def bucket_path(depth, bucket):
+        return os.path.join(root, "{}-{}".format(depth, bucket))
+
+    start = puzzle.encode_state()
+    size = len(start)
+    with open(bucket_path(0, crc32(start) % buckets), "wb") as layer:
+        # the parent of the first state is itself
+        layer.write(start + start)
+    depth, stored, frontier = 0, 1, 1
+    while frontier:
+        # expand every state of layer depth into layer depth + 1
+        outputs = [open(bucket_path(depth + 1, b), "wb", buffering=1 << 16)
+                   for b in range(buckets)]
+        try:
+            for bucket in range(buckets):
+                for state, _ in _read_layer(bucket_path(depth, bucket),
+                                            size):
+                    parent = puzzle.decode_state(state)
+                    if search.fail_fast(parent):
+                        continue
+                    exceeded = search.expand(parent, stored, frontier)
+                    if exceeded is not None:
+                        return exceeded
+                    for ext in search.extensions(parent):
+                        child = ext.encode_state()
+                        if search.is_solved(ext):
+                            return _external_path(puzzle, root, buckets,
+                                                  depth, child, state, size)
+                        outputs[crc32(child) % buckets].write(child + state)
+        finally:
+            for output in outputs:
+                output.close()
+        # deduplicate layer depth + 1 bucket by bucket
+        depth, frontier = depth + 1, 0
+        for bucket in range(buckets):
+            path = bucket_path(depth, bucket)
+            records = {}
+            for state, parent in _read_layer(path, size):
+                if state in records:
+                    search.stats.duplicates_pruned += 1
+                else:
+                    records[state] = parent
+            for older in (depth - 1, depth - 2):
+                for state, _ in _read_layer(bucket_path(older, bucket),
+                                            size):
+                    if records.pop(state, None) is not None:
+                        search.stats.duplicates_pruned += 1
+            with open(path, "wb", buffering=1 << 16) as layer:
+                for state, parent in records.items():
+                    layer.write(state + parent)
+            frontier += len(records)
+        stored += frontier
+        if stored > search.stats.peak_visited:
+            search.stats.peak_visited = stored
+    return None
+
+
+def _read_layer(path, size):
+    """
+    Yield the (state, parent) records of the layer bucket file at path,
+    whose states are size bytes long.  A missing file has no records.
+
+    @type path: str
+    @type size: int
+    @rtype: iterator[(bytes, bytes)]
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as layer:
+        with mmap.mmap(layer.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for i in range(0, len(data), 2 * size):
+                yield data[i:i + size], data[i + size:i + 2 * size]
+
+
+def _external_path(puzzle, root, buckets, depth, child, parent, size):
+    """
+    Return the PuzzleNode path from puzzle to the state child, reached
+    from the state parent in layer depth, by looking up each parent's
+    own parent in the layer before it.
+
+    @type puzzle: Puzzle
+    @type root: str
+    @type buckets: int
+    @type depth: int
+    @type child: bytes
+    @type parent: bytes
+    @type size: int
+    @rtype: PuzzleNode
+    """
+    states = [child]
+    while depth > 0:
+        states.append(parent)
+        path = os.path.join(root, "{}-{}".format(depth,
+                                                   crc32(parent) % buckets))
+        parent = next(p for s, p in _read_layer(path, size)
+                      if s == states[-1])
+        depth -= 1
+    states.reverse()
+    return node_path([puzzle] + [puzzle.decode_state(s) for s in states])
+
+# layers smaller than this are expanded in the calling process, since
+# shipping them to workers costs more than expanding them
+PARALLEL_MIN_LAYER = 64
+
+
+def parallel_breadth_first_solve(puzzle, workers=None, chunk_size=None,
+                                 budget=None, stats=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child PuzzleNode containing an extension
+    of the puzzle in its parent.  Return None if this is not possible,
+    or a BudgetExceeded if budget runs out first.  If stats is given,
+    it is filled in as the search goes.
+
+    Level-synchronous breadth-first search: each layer is cut into
+    chunks of chunk_size puzzles (by default about four chunks per
+    worker) whose extensions are computed by a pool of worker
+    processes, and the children are deduplicated against the visited
+    state keys in the calling process.  Puzzles must be picklable.
+    The budget is checked as each expanded puzzle comes back.  Time
+    spent in extensions(), is_solved() and fail_fast() is only measured
+    for layers expanded in the calling process.
+
+    @type puzzle: Puzzle
+    @type workers: int | None
+    @type chunk_size: int | None
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    The last layers of this search are big enough for the workers, and
+    one chunk each; their extensions are counted all the same:
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> p = MNPuzzle((("4", "1", "3"), ("7", "2", "6"), ("5", "8", "*")),
+    ...              (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*")))
+    >>> stats = SearchStats()
+    >>> path = parallel_breadth_first_solve(p, workers=1, chunk_size=1000,
+    ...                                     stats=stats)
+    >>> len(list(path.puzzles())) == len(list(breadth_first_solve(p).puzzles()))
+    True
+    >>> stats.nodes_generated
+    430
+    """
+    search = Search(budget, stats)
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        if search.is_solved(puzzle):
+            return PuzzleNode(puzzle)
+
+        # map each visited state key to the puzzle it was reached from
+        parents = {search.key(puzzle): None}
+        layer = [puzzle]
+        while layer:
+            # whether this layer is expanded by the worker processes
+            pooled = len(layer) >= PARALLEL_MIN_LAYER
+            if not pooled:
+                results = [[None if search.fail_fast(parent) else
+                            [(ext, search.is_solved(ext))
+                             for ext in search.extensions(parent)]
+                            for parent in layer]]
+                chunks = [layer]
+            else:
+                size = chunk_size or -(-len(layer) // (workers * 4))
+                chunks = [layer[i:i + size]
+                          for i in range(0, len(layer), size)]
+                results = executor.map(_expand_chunk, chunks)
+            next_layer = []
+            for chunk, expanded in zip(chunks, results):
+                if pooled:
+                    # count what the workers generated, as
+                    # search.extensions does here
+                    search.stats.nodes_generated += sum(
+                        [len(extensions) for extensions in expanded
+                         if not isinstance(extensions, str)])
+                for parent, extensions in zip(chunk, expanded):
+                    if extensions is None:
+                        continue
+                    if isinstance(extensions, str):
+                        search.pruned(extensions)
+                        continue
+                    exceeded = search.expand(parent, len(parents),
+                                             len(layer) + len(next_layer))
+                    if exceeded is not None:
+                        return exceeded
+                    for ext, solved in extensions:
+                        key = search.key(ext)
+                        if key in parents:
+                            search.stats.duplicates_pruned += 1
+                            continue
+                        parents[key] = parent
+                        if solved:
+                            return _path_to(ext, parents)
+                        next_layer.append(ext)
+            layer = next_layer
+        return None
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        search.finish()
+
+
+def _expand_chunk(puzzles):
+    """
+    Return, for each puzzle in puzzles, a list of (extension, solved)
+    pairs, or the fail_fast_reason() of the puzzle if it fails fast.
+
+    This runs in the worker processes of parallel_breadth_first_solve.
+
+    @type puzzles: list[Puzzle]
+    @rtype: list[list[(Puzzle, bool)] | str]
+    """
+    return [puzzle.fail_fast_reason() or
+            [(ext, ext.is_solved()) for ext in puzzle.extensions()]
+            for puzzle in puzzles]
+
+
+def parallel_depth_first_solve(puzzle, workers=None, split_depth=2,
+                               budget=None, stats=None,
+                               check_interval=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child containing an extension of the puzzle
+    in its parent.  Return None if this is not possible, or a
+    BudgetExceeded if budget runs out first.  If stats is given, it is
+    filled in as the search goes.
+
+    The search tree is split split_depth levels below puzzle, and the
+    subtrees are searched depth-first by a pool of worker processes.
+    Whenever a worker is idle and no subtree is waiting, busy workers
+    hand back the unexplored parts of their stacks for idle workers to
+    take.  As soon as one worker finds a solution the others are
+    cancelled.  Puzzles must be picklable.
+
+    Workers report the nodes they expanded when their task ends, so
+    with a node limit each task is handed back after an equal share of
+    the nodes left.  The visited size of the budget, and every counter
+    of stats besides nodes_expanded, cover only the splitting done in
+    the calling process.  Time and cancellation are checked every
+    POLL_INTERVAL seconds, and workers check for cancellation and idle
+    workers every check_interval nodes (by default CHECK_INTERVAL).
+
+    @type puzzle: Puzzle
+    @type workers: int | None
+    @type split_depth: int
+    @type budget: Budget | None
+    @type stats: SearchStats | None
+    @type check_interval: int | None
+    @rtype: PuzzleNode | BudgetExceeded | None
+
+    A tiny check_interval makes workers hand back their stacks all the
+    time, so tasks often start on a solution:
+
+    >>> from puzzle_generators import sudoku_puzzle
+    >>> all(parallel_depth_first_solve(sudoku_puzzle(4, 12, seed),
+    ...                                workers=2, split_depth=0,
+    ...                                check_interval=2) is not None
+    ...     for seed in range(5))
+    True
+    """
+    search = Search(budget, stats)
+    workers = workers or os.cpu_count() or 1
+    stop, hungry = multiprocessing.Event(), multiprocessing.Event()
+    executor = None
+    try:
+        if search.is_solved(puzzle):
+            return PuzzleNode(puzzle)
+        if search.fail_fast(puzzle):
+            return None
+
+        # tasks are paths from puzzle to the root of a subtree to search
+        tasks, visited = [[puzzle]], {search.key(puzzle)}
+        for _ in range(split_depth):
+            next_tasks = []
+            for path in tasks:
+                exceeded = search.expand(path[-1], len(visited),
+                                         len(tasks) + len(next_tasks))
+                if exceeded is not None:
+                    return exceeded
+                for ext in search.extensions(path[-1]):
+                    key = search.key(ext)
+                    if key in visited:
+                        search.stats.duplicates_pruned += 1
+                        continue
+                    visited.add(key)
+                    if search.is_solved(ext):
+                        return node_path(path + [ext])
+                    if not search.fail_fast(ext):
+                        next_tasks.append(path + [ext])
+            tasks = next_tasks
+        # search the first subtrees first, since tasks are taken from the
+        # end
+        tasks.reverse()
+
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=_init_depth_first_worker,
+                                       initargs=(stop, hungry,
+                                                 check_interval or
+                                                 CHECK_INTERVAL))
+        running = set()
+        while tasks or running:
+            quota = None
+            if budget is not None and budget.max_nodes is not None:
+                quota = max(1, (budget.max_nodes -
+                                search.stats.nodes_expanded) // workers)
+            while tasks and len(running) < workers:
+                running.add(executor.submit(_depth_first_task, tasks.pop(),
+                                            quota))
+            if tasks or len(running) == workers:
+                hungry.clear()
+            else:
+                hungry.set()
+            done, running = wait(running, timeout=POLL_INTERVAL,
+                                 return_when=FIRST_COMPLETED)
+            expanded = 0
+            for future in done:
+                outcome, value, nodes = future.result()
+                expanded += nodes
+                if outcome == "solved":
+                    search.expand(None, len(visited),
+                                  len(tasks) + len(running), expanded)
+                    return node_path(value)
+                elif outcome == "split":
+                    tasks.extend(reversed(value))
+            exceeded = search.expand(None, len(visited),
+                                     len(tasks) + len(running), expanded)
+            if exceeded is not None:
+                return exceeded
+        return None
+    finally:
+        stop.set()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        search.finish()
+
+
+# how many nodes a depth-first worker expands between checks for
+# cancellation and idle workers
+CHECK_INTERVAL = 512
+# how many seconds parallel_depth_first_solve waits for a worker before
+# checking its budget
+POLL_INTERVAL = 0.05
+_stop = _hungry = None
+_check_interval = CHECK_INTERVAL
+
+
+def _init_depth_first_worker(stop, hungry, check_interval=CHECK_INTERVAL):
+    """
+    Remember the events shared by the workers of
+    parallel_depth_first_solve, and how often to check them.
+
+    @type stop: multiprocessing.Event
+    @type hungry: multiprocessing.Event
+    @type check_interval: int
+    @rtype: None
+    """
+    global _stop, _hungry, _check_interval
+    _stop, _hungry, _check_interval = stop, hungry, check_interval
+
+
+def _depth_first_task(path, quota=None):
+    """
+    Search the subtree below the last puzzle of path depth-first.
+
+    Return ("solved", path to a solution), ("done", None) once the
+    subtree is exhausted, ("cancelled", None) if another worker found a
+    solution, or ("split", paths) handing every unexplored extension on
+    the stack back as new tasks when some worker is idle or quota nodes
+    have been expanded, followed by the number of nodes expanded.
+
+    @type path: list[Puzzle]
+    @type quota: int | None
+    @rtype: (str, list, int)
+    """
+    # a task handed back by a split starts on an extension nobody has
+    # looked at yet
+    if path[-1].is_solved():
+        return "solved", path, 0
+    if path[-1].fail_fast():
+        return "done", None, 0
+    base = len(path) - 1
+    visited = {p.state_key() for p in path}
+    stack = [path[-1].iter_extensions()]
+    expanded = steps = 1
+    while stack:
+        steps += 1
+        if steps % _check_interval == 0 or expanded == quota:
+            if _stop.is_set():
+                return "cancelled", None, expanded
+            if _hungry.is_set() or expanded == quota:
+                # stack[i] holds the extensions of path[base + i]
+                return "split", [path[:base + i + 1] + [ext]
+                                 for i, extensions in enumerate(stack)
+                                 for ext in extensions], expanded
+        for ext in stack[-1]:
+            key = ext.state_key()
+            if key not in visited:
+                visited.add(key)
+                if ext.is_solved():
+                    return "solved", path + [ext], expanded
+                elif not ext.fail_fast():
+                    stack.append(ext.iter_extensions_from(path[-1]))
+                    path.append(ext)
+                    expanded += 1
+                    break
+        else:
+            stack.pop()
+            path.pop()
+    return "done", None, expanded
+
+
+# the solvers by strategy name, for callers that pick one by name
+STRATEGIES = {
+    "depth_first": depth_first_solve,
+    "in_place_depth_first": in_place_depth_first_solve,
+    "breadth_first": breadth_first_solve,
+    "a_star": a_star_solve,
+    "ida_star": ida_star_solve,
+    "bidirectional": bidirectional_solve,
+    "external_breadth_first": external_breadth_first_solve,
+    "parallel_breadth_first": parallel_breadth_first_solve,
+    "parallel_depth_first": parallel_depth_first_solve,
+}
+
+
+def solve_many(puzzles, strategy="depth_first", workers=None,
+               chunk_size=None, budget=None):
+    """
+    Return a BatchReport of solving every puzzle in puzzles with the
+    solver named strategy in STRATEGIES, each within its own budget.
+    Its results are in the order of puzzles.
+
+    Puzzles posing the same problem (the same type and problem_key())
+    are solved once.  The distinct ones are cut into chunks of
+    chunk_size (by default about four chunks per worker) and solved by
+    a pool of workers processes, or in the calling process if workers
+    is 1.  Workers send back only the state keys along each solution,
+    which are replayed from the puzzle here.  An exception raised while
+    solving a puzzle is recorded in the report rather than raised.
+    Puzzles must be picklable, and strategy should be a sequential one.
+
+    @type puzzles: list[Puzzle]
+    @type strategy: str
+    @type workers: int | None
+    @type chunk_size: int | None
+    @type budget: Budget | None
+    @rtype: BatchReport
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"sad", "bad", "bat", "cat"}
+    >>> batch = [WordLadderPuzzle(w, "cat", ws)
+    ...          for w in ["sad", "bat", "sad", "dog"]]
+    >>> report = solve_many(batch, "breadth_first", workers=1)
+    >>> [len(list(r.puzzles())) if r else r for r in report.results]
+    [4, 2, 4, None]
+    >>> report.duplicates, report.errors
+    (1, [None, None, None, None])
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError("unknown strategy {!r}".format(strategy))
+    start = time.perf_counter()
+    puzzles = list(puzzles)
+    report = BatchReport(len(puzzles))
+    # the index of the first puzzle posing each distinct problem, and
+    # the index of the distinct problem each puzzle poses
+    first, problem_of = {}, []
+    for puzzle in puzzles:
+        problem_of.append(first.setdefault(
+            (type(puzzle), puzzle.problem_key()), len(first)))
+    distinct = [None] * len(first)
+    for i in reversed(range(len(puzzles))):
+        distinct[problem_of[i]] = puzzles[i]
+    report.duplicates = len(puzzles) - len(distinct)
+
+    workers = workers or os.cpu_count() or 1
+    size = chunk_size or max(1, -(-len(distinct) // (workers * 4)))
+    chunks = [distinct[i:i + size] for i in range(0, len(distinct), size)]
+    task = partial(_solve_chunk, strategy, budget)
+    if workers == 1:
+        outcomes = [o for chunk in chunks for o in task(chunk)]
     else:
-        list_of_ext = puzzle.extensions()
-        visited = []
-        if puzzle not in visited:
-            visited.append(puzzle)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outcomes = [o for done in executor.map(task, chunks)
+                        for o in done]
+
+    solutions = []
+    for puzzle, (outcome, value, seconds) in zip(distinct, outcomes):
+        if outcome == "solved":
+            value = node_path(_follow_keys(puzzle, value))
+        solutions.append((outcome, value, seconds))
+    for i, problem in enumerate(problem_of):
+        outcome, value, seconds = solutions[problem]
+        report.seconds[i] = seconds
+        if outcome == "error":
+            report.errors[i] = value
+        elif outcome == "solved" and i != problem:
+            # each result gets its own nodes, starting from its own puzzle
+            report.results[i] = node_path([puzzles[i]] +
+                                           list(value.puzzles())[1:])
+        else:
+            report.results[i] = value
+    report.elapsed = time.perf_counter() - start
+    return report
 
-        queue = deque()
-        for puzzles in list_of_ext:
-            queue.append(PuzzleNode(puzzles, None, PuzzleNode(puzzles)))
 
-        if queue:
-                pop_left_ext = queue.popleft()
-                ext_puzzle = pop_left_ext.puzzle
-                ext_parent = pop_left_ext.parent.puzzle
+def _solve_chunk(strategy, budget, puzzles):
+    """
+    Return a list of (outcome, value, seconds) for solving each puzzle
+    in puzzles with the solver named strategy within budget: outcome
+    "solved" with the state keys along the solution after the first,
+    "unsolved" with None or a BudgetExceeded, or "error" with the
+    exception raised.
 
-                if pop_left_ext not in visited:
-                    visited.append(pop_left_ext)
-                    node = solve2(ext_puzzle, visited, queue, ext_parent)
-                    if node is not None:
-                        head = PuzzleNode(puzzle,[node],None)
-                        return head
+    @type strategy: str
+    @type budget: Budget | None
+    @type puzzles: list[Puzzle]
+    @rtype: list[(str, object, float)]
+    """
+    solver, outcomes = STRATEGIES[strategy], []
+    for puzzle in puzzles:
+        start = time.perf_counter()
+        try:
+            solution = solver(puzzle, budget=budget)
+        except Exception as error:
+            outcomes.append(("error", repr(error),
+                             time.perf_counter() - start))
+            continue
+        seconds = time.perf_counter() - start
+        if isinstance(solution, PuzzleNode):
+            outcomes.append(("solved", [p.state_key() for p
+                                        in solution.puzzles()][1:], seconds))
+        else:
+            outcomes.append(("unsolved", solution, seconds))
+    return outcomes
 
-# Helper ftn for breadth
-def solve2(puzzle, visited, queue, parent=None):
 
+def _path_to(puzzle, parents):
+    """
+    Return the PuzzleNode path from the root of a search to puzzle,
+    following the parent pointers recorded in parents.
+
+    @type puzzle: Puzzle
+    @type parents: dict[object, Puzzle | None]
+    @rtype: PuzzleNode
+    """
+    path = [puzzle]
+    parent = parents[puzzle.state_key()]
+    while parent is not None:
+        path.append(parent)
+        parent = parents[parent.state_key()]
+    path.reverse()
+    return node_path(path)
+
+
+def node_path(puzzles):
+    """
+    Return a chain of PuzzleNodes for the puzzles in list puzzles, each
+    node having the next one as its only child.
+
+    @type puzzles: list[Puzzle]
+    @rtype: PuzzleNode
+    """
+    node = PuzzleNode(puzzles[-1])
+    for puzzle in reversed(puzzles[:-1]):
+        head = PuzzleNode(puzzle, [node])
+        node.parent = head
+        node = head
+    return node
+
+
+class Budget:
+    """
+    Limits on the work a solver may do before it gives up.
+
+    A solver whose budget runs out returns a BudgetExceeded naming the
+    limit, with the stats of the search so far:
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+    ...              (("1", "2", "3"), ("4", "5", "*")))
+    >>> result = breadth_first_solve(p, budget=Budget(max_nodes=3))
+    >>> result.reason, result.stats.nodes_expanded
+    ('max_nodes', 3)
+    >>> import threading
+    >>> cancel = threading.Event()
+    >>> cancel.set()
+    >>> result = depth_first_solve(p, budget=Budget(cancel=cancel))
+    >>> result.reason, result.stats.nodes_expanded
+    ('cancelled', 1)
+    """
+
+    def __init__(self, max_nodes=None, time_limit=None, max_visited=None,
+                 cancel=None):
+        """
+        Create a new Budget self.  Each limit left as None is not
+        enforced.
+
+        @type self: Budget
+        @type max_nodes: int | None
+            most puzzles to expand
+        @type time_limit: float | None
+            most wall-clock seconds to search for
+        @type max_visited: int | None
+            most state keys to hold in the visited set
+        @type cancel: threading.Event | None
+            cancellation token: the search stops once cancel.is_set()
+        @rtype: None
+        """
+        self.max_nodes, self.time_limit = max_nodes, time_limit
+        self.max_visited, self.cancel = max_visited, cancel
+
+    def exceeded(self, stats, visited):
+        """
+        Return the name of the first limit of Budget self exceeded by a
+        search with SearchStats stats and visited state keys held, or
+        None if there is none.
+
+        @type self: Budget
+        @type stats: SearchStats
+        @type visited: int
+        @rtype: str | None
+
+        >>> stats = SearchStats()
+        >>> stats.nodes_expanded = 10
+        >>> Budget(max_nodes=10).exceeded(stats, 3)
+        'max_nodes'
+        >>> Budget(max_nodes=11, max_visited=3).exceeded(stats, 3) is None
+        True
+        """
+        if self.cancel is not None and self.cancel.is_set():
+            return "cancelled"
+        elif (self.max_nodes is not None and
+              stats.nodes_expanded >= self.max_nodes):
+            return "max_nodes"
+        elif self.max_visited is not None and visited > self.max_visited:
+            return "max_visited"
+        elif (self.time_limit is not None and
+              stats.elapsed >= self.time_limit):
+            return "time_limit"
+        return None
+
+
+class SearchStats:
+    """
+    Counters gathered while a solver runs.
+
+    Pass a SearchStats to a solver to have it filled in.  If on_expand
+    is given, it is called with each puzzle the solver expands and
+    self, so the numbers can be fed to monitoring as the search goes.
+    """
+
+    def __init__(self, on_expand=None):
+        """
+        Create a new SearchStats self with every counter at zero.
+
+        @type self: SearchStats
+        @type on_expand: (Puzzle, SearchStats) -> Any | None
+        @rtype: None
+        """
+        self.on_expand = on_expand
+        # puzzles whose extensions were computed, and those extensions
+        self.nodes_expanded = self.nodes_generated = 0
+        # extensions dropped because their state key was already seen
+        self.duplicates_pruned = 0
+        # puzzles not expanded because fail_fast() returned True
+        self.fail_fast_prunes = 0
+        # those puzzles, counted by the rule fail_fast_reason() named
+        self.fail_fast_reasons = {}
+        # most puzzles waiting to be expanded, and most state keys held
+        self.peak_frontier = self.peak_visited = 0
+        # seconds spent inside extensions(), is_solved() and state_key();
+        # state keys stand in for __eq__ in every duplicate check
+        self.extensions_time = self.is_solved_time = 0.0
+        self.state_key_time = 0.0
+        # seconds spent in the whole search
+        self.elapsed = 0.0
+
+    def __str__(self):
+        """
+        Return a human-readable string representing SearchStats self.
+
+        >>> print(SearchStats())
+        0 nodes expanded, 0 peak visited, 0.000s
+        """
+        return "{} nodes expanded, {} peak visited, {:.3f}s".format(
+            self.nodes_expanded, self.peak_visited, self.elapsed)
+
+    def as_dict(self):
+        """
+        Return the counters of SearchStats self as a dict.
+
+        @type self: SearchStats
+        @rtype: dict[str, int | float | dict[str, int]]
+
+        >>> sorted(SearchStats().as_dict())[:3]
+        ['duplicates_pruned', 'elapsed', 'extensions_time']
+        """
+        return {name: value for (name, value) in vars(self).items()
+                if name != "on_expand"}
+
+
+class BatchReport:
+    """
+    The results of solve_many, with the time each one took.
+    """
+
+    def __init__(self, size):
+        """
+        Create a new BatchReport self for a batch of size puzzles, with
+        no results yet.
+
+        @type self: BatchReport
+        @type size: int
+        @rtype: None
+        """
+        # what the solver returned for each puzzle, in batch order, or
+        # None where it raised
+        self.results = [None] * size
+        # the repr of the exception raised for each puzzle, or None
+        self.errors = [None] * size
+        # seconds spent solving each puzzle; duplicates repeat the time
+        # of the puzzle they were solved as
+        self.seconds = [0.0] * size
+        # puzzles that posed the same problem as an earlier one
+        self.duplicates = 0
+        # seconds spent on the whole batch
+        self.elapsed = 0.0
+
+    def throughput(self):
+        """
+        Return the puzzles of BatchReport self solved per second.
+
+        @type self: BatchReport
+        @rtype: float
+
+        >>> report = BatchReport(10)
+        >>> report.elapsed = 2.0
+        >>> report.throughput()
+        5.0
+        """
+        return len(self.results) / self.elapsed if self.elapsed else 0.0
+
+    def failures(self):
+        """
+        Return the indices of the puzzles of BatchReport self whose
+        solver raised.
+
+        @type self: BatchReport
+        @rtype: list[int]
         """
-        Return the child PuzzleNode
-        Returns a child PuzzleNode
+        return [i for i, error in enumerate(self.errors) if error is not None]
+
+    def __str__(self):
+        """
+        Return a human-readable string representing BatchReport self.
+
+        >>> print(BatchReport(3))
+        3 puzzles (0 duplicates, 0 failed) in 0.000s, 0.0 puzzles/s
+        """
+        return ("{} puzzles ({} duplicates, {} failed) in {:.3f}s, "
+                "{:.1f} puzzles/s".format(len(self.results), self.duplicates,
+                                          len(self.failures()), self.elapsed,
+                                          self.throughput()))
+
+
+class BudgetExceeded:
+    """
+    The result of a solver that ran out of budget before it could tell
+    whether its puzzle has a solution.
+    """
+
+    def __init__(self, reason, stats):
+        """
+        Create a new BudgetExceeded self for the limit named reason,
+        with the SearchStats gathered up to that point.
+
+        @type self: BudgetExceeded
+        @type reason: str
+        @type stats: SearchStats
+        @rtype: None
+        """
+        self.reason, self.stats = reason, stats
+
+    def __str__(self):
+        """
+        Return a human-readable string representing BudgetExceeded self.
+
+        >>> print(BudgetExceeded("max_nodes", SearchStats()))
+        budget exceeded (max_nodes) after 0 nodes expanded, 0 peak visited, 0.000s
+        """
+        return "budget exceeded ({}) after {}".format(self.reason, self.stats)
+
+
+class Search:
+    """
+    Bookkeeping shared by the solvers: the budget of one search and the
+    SearchStats it gathers.  Calls to a puzzle's extensions(),
+    is_solved(), fail_fast() and state_key() go through Search so they
+    can be counted, and timed when the caller asked for stats.
+    """
+
+    def __init__(self, budget, stats=None):
+        """
+        Start a new Search self limited by budget, filling in stats if
+        it is given.
+
+        @type self: Search
+        @type budget: Budget | None
+        @type stats: SearchStats | None
+        @rtype: None
+        """
+        self.budget = budget
+        self.timed = stats is not None
+        self.stats = stats if stats is not None else SearchStats()
+        self._start = time.perf_counter()
+
+    def extensions(self, puzzle):
+        """
+        Return puzzle.extensions().
+
+        @type self: Search
+        @type puzzle: Puzzle
+        @rtype: list[Puzzle]
+        """
+        if self.timed:
+            start = time.perf_counter()
+            extensions = puzzle.extensions()
+            self.stats.extensions_time += time.perf_counter() - start
+        else:
+            extensions = puzzle.extensions()
+        self.stats.nodes_generated += len(extensions)
+        return extensions
+
+    def legal_moves(self, puzzle, move=None):
+        """
+        Return puzzle.legal_moves(), counted as extensions, or
+        puzzle.legal_moves_after(move) if puzzle was just reached by
+        move.
+
+        @type self: Search
         @type puzzle: Puzzle
-        @type visited: list
-        @type queue: deque
-        @type parent: PuzzleNode
-        @rtype: PuzzleNode
+        @type move: object | None
+        @rtype: list[object]
         """
-        if puzzle.is_solved():
-            return PuzzleNode(puzzle, [], parent)
+        if self.timed:
+            start = time.perf_counter()
+            moves = _legal_moves(puzzle, move)
+            self.stats.extensions_time += time.perf_counter() - start
+        else:
+            moves = _legal_moves(puzzle, move)
+        self.stats.nodes_generated += len(moves)
+        return moves
 
+    def iter_extensions(self, puzzle, parent=None):
+        """
+        Return puzzle.iter_extensions(), or
+        puzzle.iter_extensions_from(parent) if puzzle is an extension
+        of parent, wrapped to count and time the extensions as they are
+        produced if the caller asked for stats.  Without stats, nothing
+        wraps the iterator, so nodes_generated is not counted.
+
+        @type self: Search
+        @type puzzle: Puzzle
+        @type parent: Puzzle | None
+        @rtype: iterator[Puzzle]
+        """
+        if parent is None:
+            extensions = puzzle.iter_extensions()
         else:
-            lst_of_ext = puzzle.extensions()
-            puzzle.children=lst_of_ext
+            extensions = puzzle.iter_extensions_from(parent)
+        if not self.timed:
+            return extensions
+        return self._timed_extensions(extensions)
+
+    def _timed_extensions(self, extensions):
+        """
+        Yield each puzzle of the iterator extensions, adding the time
+        taken to produce it to the stats of Search self.
 
-            for ext in lst_of_ext:
-                queue.append(PuzzleNode(ext, None, PuzzleNode(puzzle)))
+        @type self: Search
+        @type extensions: iterator[Puzzle]
+        @rtype: iterator[Puzzle]
+        """
+        stats = self.stats
+        while True:
+            start = time.perf_counter()
+            ext = next(extensions, None)
+            stats.extensions_time += time.perf_counter() - start
+            if ext is None:
+                return
+            stats.nodes_generated += 1
+            yield ext
+
+    def is_solved(self, puzzle):
+        """
+        Return puzzle.is_solved().
+
+        @type self: Search
+        @type puzzle: Puzzle
+        @rtype: bool
+        """
+        if not self.timed:
+            return puzzle.is_solved()
+        start = time.perf_counter()
+        solved = puzzle.is_solved()
+        self.stats.is_solved_time += time.perf_counter() - start
+        return solved
+
+    def fail_fast(self, puzzle):
+        """
+        Return puzzle.fail_fast(), counting the prune by its rule.
+
+        @type self: Search
+        @type puzzle: Puzzle
+        @rtype: bool
+        """
+        reason = puzzle.fail_fast_reason()
+        if reason is None:
+            return False
+        self.pruned(reason)
+        return True
+
+    def pruned(self, reason):
+        """
+        Count a puzzle left unexpanded because its fail_fast_reason()
+        was reason.
+
+        @type self: Search
+        @type reason: str
+        @rtype: None
+
+        >>> search = Search(None)
+        >>> search.pruned("pagoda")
+        >>> search.pruned("pagoda")
+        >>> search.stats.fail_fast_prunes, search.stats.fail_fast_reasons
+        (2, {'pagoda': 2})
+        """
+        self.stats.fail_fast_prunes += 1
+        reasons = self.stats.fail_fast_reasons
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+    def key(self, puzzle):
+        """
+        Return puzzle.state_key().
+
+        @type self: Search
+        @type puzzle: Puzzle
+        @rtype: object
+        """
+        if not self.timed:
+            return puzzle.state_key()
+        start = time.perf_counter()
+        key = puzzle.state_key()
+        self.stats.state_key_time += time.perf_counter() - start
+        return key
+
+    def expand(self, puzzle, visited, frontier, nodes=1):
+        """
+        Record that nodes more puzzles, the last of them puzzle, are
+        being expanded while visited state keys are held and frontier
+        puzzles wait to be expanded.  Return a BudgetExceeded if that
+        goes over the budget of Search self, or None otherwise.
 
-            while True:
-                pop_left_ext = queue.popleft()
-                ext_puzzle = pop_left_ext.puzzle
-                ext_parent = pop_left_ext.parent.puzzle
+        puzzle is None when the expansions happened in other processes;
+        on_expand is only called for puzzles expanded here.
 
-                if pop_left_ext not in visited:
-                    visited.append(pop_left_ext)
-                    node = solve2(ext_puzzle, visited, queue, ext_parent)
-                    if node is not None:
-                        head = PuzzleNode(puzzle, [node], None)
-                        return head
+        @type self: Search
+        @type puzzle: Puzzle | None
+        @type visited: int
+        @type frontier: int
+        @type nodes: int
+        @rtype: BudgetExceeded | None
+        """
+        stats = self.stats
+        stats.nodes_expanded += nodes
+        if visited > stats.peak_visited:
+            stats.peak_visited = visited
+        if frontier > stats.peak_frontier:
+            stats.peak_frontier = frontier
+        if stats.on_expand is not None and puzzle is not None:
+            stats.on_expand(puzzle, stats)
+        if self.budget is None:
+            return None
+        stats.elapsed = time.perf_counter() - self._start
+        reason = self.budget.exceeded(stats, visited)
+        if reason is None:
+            return None
+        return BudgetExceeded(reason, stats)
+
+    def finish(self):
+        """
+        Record the time the search of Search self took.
+
+        @type self: Search
+        @rtype: None
+        """
+        self.stats.elapsed = time.perf_counter() - self._start
 
 
 # Class PuzzleNode helps build trees of PuzzleNodes that have
@@ -342,12 +1990,19 @@ class PuzzleNode:
     """
     A Puzzle configuration that refers to other configurations that it
     can be extended to.
+
+    Solvers return paths of PuzzleNodes, each with at most one child, so
+    the methods below walk them with loops rather than recursion: paths
+    of any length can be compared and printed.
     """
+    __slots__ = ("puzzle", "children", "parent")
 
     def __init__(self, puzzle=None, children=None, parent=None):
         """
         Create a new puzzle node self with configuration puzzle.
 
+        The list children is kept as given, not copied.
+
         @type self: PuzzleNode
         @type puzzle: Puzzle | None
         @type children: list[PuzzleNode]
@@ -355,10 +2010,7 @@ class PuzzleNode:
         @rtype: None
         """
         self.puzzle, self.parent = puzzle, parent
-        if children is None:
-            self.children = []
-        else:
-            self.children = children[:]
+        self.children = [] if children is None else children
 
     def __eq__(self, other):
         """
@@ -377,16 +2029,68 @@ class PuzzleNode:
         >>> pn1.__eq__(pn3)
         False
         """
-        return (type(self) == type(other) and
-                self.puzzle == other.puzzle and
-                all([x in self.children for x in other.children]) and
-                all([x in other.children for x in self.children]))
+        # follow single children in a loop; only real branching falls
+        # back to comparing children, each of which loops the same way
+        while (type(self) == type(other) and
+               self.puzzle == other.puzzle):
+            if len(self.children) == len(other.children) <= 1:
+                if not self.children:
+                    return True
+                self, other = self.children[0], other.children[0]
+            else:
+                return (all(x in self.children for x in other.children) and
+                        all(x in other.children for x in self.children))
+        return False
 
     def __str__(self):
         """
-        Return a human-readable string representing PuzzleNode self.
+        Return a human-readable string representing PuzzleNode self:
+        its puzzle and a blank line, followed by the strings of its
+        children, one per line.
+
+        >>> from word_ladder_puzzle import WordLadderPuzzle
+        >>> ws = {"sad", "bad", "bat"}
+        >>> path = node_path([WordLadderPuzzle(w, "bat", ws)
+        ...                    for w in ["sad", "bad", "bat"]])
+        >>> print(path)
+        sad --> bat
+        <BLANKLINE>
+        bad --> bat
+        <BLANKLINE>
+        bat --> bat
+        <BLANKLINE>
+        <BLANKLINE>
+        """
+        parts, stack = [], [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            parts.append("{}\n\n".format(item.puzzle))
+            # pushed in reverse, so the first child comes out first
+            for i in range(len(item.children) - 1, -1, -1):
+                stack.append(item.children[i])
+                if i:
+                    stack.append("\n")
+        return "".join(parts)
 
-        # doctest not feasible.
+    def puzzles(self):
+        """
+        Yield the puzzle of PuzzleNode self and of each first child
+        below it: the puzzles along a solution path, in order.
+
+        @type self: PuzzleNode
+        @rtype: iterator[Puzzle]
+
+        >>> from word_ladder_puzzle import WordLadderPuzzle
+        >>> ws = {"sad", "bad"}
+        >>> path = node_path([WordLadderPuzzle("sad", "bad", ws),
+        ...                    WordLadderPuzzle("bad", "bad", ws)])
+        >>> [str(p) for p in path.puzzles()]
+        ['sad --> bad', 'bad --> bad']
         """
-        return "{}\n\n{}".format(self.puzzle,
-                                 "\n".join([str(x) for x in self.children]))
\ No newline at end of file
+        node = self
+        while node is not None:
+            yield node.puzzle
+            node = node.children[0] if node.children else None
@@ -0,0 +1,199 @@
+"""
+Scaling curves: time, peak memory and nodes expanded of each solver
+against the difficulty of generated puzzles.
+
+    python scaling.py --time-limit 10 --output scaling.json
+
+runs every family at rising difficulty until each solver falls off the
+cliff (runs out of its time limit), then plots the curves to
+scaling.png if matplotlib is installed, and otherwise only writes the
+results, as JSON or (with a .csv output) CSV.
+"""
+import argparse
+import csv
+import json
+import sys
+import tracemalloc
+from time import perf_counter
+
+import puzzle_generators
+from puzzle_tools import (a_star_solve, breadth_first_solve,
+                          depth_first_solve, Budget, BudgetExceeded,
+                          SearchStats)
+
+# each family is (name, label of the difficulty, difficulty levels,
+# function of a level and a seed returning a fresh puzzle, solvers)
+FAMILIES = [
+    ("mn_3x3", "scramble depth", [4, 8, 12, 16, 20, 24, 28],
+     lambda level, seed: puzzle_generators.mn_puzzle(3, 3, level, seed),
+     [breadth_first_solve, depth_first_solve, a_star_solve]),
+    ("peg", "side of a square board half full of pegs", [3, 4, 5, 6, 7, 8],
+     lambda level, seed: puzzle_generators.peg_puzzle(level, level,
+                                                      level * level // 2,
+                                                      seed),
+     [depth_first_solve, breadth_first_solve]),
+    ("sudoku_9", "empty cells", [20, 30, 40, 50, 55, 60],
+     lambda level, seed: puzzle_generators.sudoku_puzzle(9, 81 - level,
+                                                         seed),
+     [depth_first_solve]),
+    ("sudoku_16", "empty cells", [40, 80, 120, 160],
+     lambda level, seed: puzzle_generators.sudoku_puzzle(16, 256 - level,
+                                                         seed),
+     [depth_first_solve]),
+    ("word_ladder", "ladder distance", [2, 3, 4, 5, 6, 7],
+     lambda level, seed: puzzle_generators.word_ladder_puzzle(level,
+                                                              seed=seed),
+     [breadth_first_solve, a_star_solve, depth_first_solve]),
+]
+
+FIELDS = ["family", "solver", "level", "seconds", "peak_bytes",
+          "nodes_expanded", "outcome"]
+
+
+def measure(make_puzzle, solver, time_limit=None):
+    """
+    Return a dict of the seconds, peak bytes allocated and nodes
+    expanded by solver on a fresh make_puzzle(), and its outcome:
+    "solved", "unsolvable" or the name of the exceeded limit.
+
+    Time is taken on its own run, as tracing allocations slows the
+    search; memory and nodes come from a second run, skipped when the
+    first ran out of time_limit.
+
+    @type make_puzzle: () -> Puzzle
+    @type solver: (Puzzle) -> PuzzleNode | BudgetExceeded | None
+    @type time_limit: float | None
+    @rtype: dict
+    """
+    puzzle = make_puzzle()
+    start = perf_counter()
+    result = solver(puzzle, budget=Budget(time_limit=time_limit))
+    seconds = perf_counter() - start
+    if isinstance(result, BudgetExceeded):
+        return {"seconds": seconds, "peak_bytes": None,
+                "nodes_expanded": None, "outcome": result.reason}
+    puzzle, stats = make_puzzle(), SearchStats()
+    tracemalloc.start()
+    try:
+        solver(puzzle, stats=stats)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak,
+            "nodes_expanded": stats.nodes_expanded,
+            "outcome": "unsolvable" if result is None else "solved"}
+
+
+def run(names=None, time_limit=10.0, seed=0, out=sys.stdout):
+    """
+    Return one row per family of FAMILIES named in names (or all of
+    them), solver and difficulty level, printing each to out.  Once a
+    solver exceeds time_limit on a family it is not run on the harder
+    levels.
+
+    @type names: list[str] | None
+    @type time_limit: float | None
+    @type seed: int
+    @type out: file
+    @rtype: list[dict]
+    """
+    rows = []
+    for family, _, levels, generate, solvers in FAMILIES:
+        if names and family not in names:
+            continue
+        for solver in solvers:
+            for level in levels:
+                row = measure(lambda: generate(level, seed), solver,
+                              time_limit)
+                row.update(family=family, solver=solver.__name__,
+                           level=level)
+                rows.append(row)
+                print("{:<12} {:<20} {:>4} {:9.4f}s {!s:>12} bytes "
+                      "{!s:>9} nodes  {}".format(
+                          family, solver.__name__, level, row["seconds"],
+                          row["peak_bytes"], row["nodes_expanded"],
+                          row["outcome"]), file=out)
+                if row["outcome"] == "time_limit":
+                    break
+    return rows
+
+
+def plot(rows, path):
+    """
+    Plot rows as one figure of time, memory and nodes against level per
+    family, with a line per solver, and save it to path.  Return False
+    without plotting if matplotlib is not installed.
+
+    @type rows: list[dict]
+    @type path: str
+    @rtype: bool
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+    families = [f for f in FAMILIES if any(r["family"] == f[0]
+                                           for r in rows)]
+    metrics = [("seconds", "seconds"), ("peak_bytes", "peak bytes"),
+               ("nodes_expanded", "nodes expanded")]
+    figure, axes = plt.subplots(len(families), len(metrics),
+                                figsize=(5 * len(metrics),
+                                         4 * len(families)),
+                                squeeze=False)
+    for i, (family, label, _, _, _) in enumerate(families):
+        for j, (metric, title) in enumerate(metrics):
+            ax = axes[i][j]
+            for solver in sorted({r["solver"] for r in rows
+                                  if r["family"] == family}):
+                points = [(r["level"], r[metric]) for r in rows
+                          if r["family"] == family and
+                          r["solver"] == solver and r[metric] is not None]
+                if points:
+                    ax.plot(*zip(*points), marker="o", label=solver)
+            ax.set_yscale("log")
+            ax.set_xlabel(label)
+            ax.set_title("{}: {}".format(family, title))
+            ax.legend()
+    figure.tight_layout()
+    figure.savefig(path)
+    return True
+
+
+def main(argv=None):
+    """
+    Run the scaling command line with arguments argv.
+
+    @type argv: list[str] | None
+    @rtype: int
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("families", nargs="*",
+                        help="names of the families to run (default: all)")
+    parser.add_argument("--time-limit", type=float, default=10.0,
+                        help="seconds a solver may spend on one puzzle")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="scaling.json",
+                        help="write the results here, as CSV if the name "
+                             "ends in .csv and JSON otherwise")
+    parser.add_argument("--plot", default="scaling.png",
+                        help="save the plot here if matplotlib is installed")
+    args = parser.parse_args(argv)
+
+    rows = run(args.families, args.time_limit, args.seed)
+    with open(args.output, "w", newline="") as output:
+        if args.output.endswith(".csv"):
+            writer = csv.DictWriter(output, FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, output, indent=2)
+    if not plot(rows, args.plot):
+        print("matplotlib is not installed; wrote {} only".format(
+            args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""
+An opt-in cache of solutions in front of the puzzle_tools solvers, so
+repeated instances are solved once.
+"""
+from ast import literal_eval
+from collections import OrderedDict
+from hashlib import sha256
+import sqlite3
+import threading
+
+from puzzle_tools import BudgetExceeded, path_from_keys, STRATEGIES
+
+# the form of the state keys stored on disk; bump it whenever a puzzle
+# changes what its state_key() returns, so files written before are
+# emptied rather than replayed
+FORMAT_VERSION = 2
+# returned by the tiers for a problem they have no entry for, since None
+# is the cached answer for an unsolvable one
+_MISSING = object()
+
+
+class SolutionCache:
+    """
+    Solutions keyed on the problem a puzzle poses (Puzzle.problem_key)
+    and the strategy that solved it, in an in-memory LRU tier backed by
+    an optional sqlite file.
+
+    Only the state keys along a solution are stored; a hit replays them
+    from the puzzle asked about, so it returns fresh PuzzleNodes.
+    Unsolvable puzzles are cached too, searches that ran out of budget
+    are not.  The file holds reprs of state keys, read back with
+    ast.literal_eval, so it is safe to share, and the FORMAT_VERSION
+    they were written in: a file of another version is emptied when it
+    is opened.  An entry that can no longer be replayed is dropped and
+    counted as a miss.
+    """
+
+    def __init__(self, path=None, capacity=1024, max_disk_bytes=None):
+        """
+        Create a new SolutionCache self that keeps up to capacity
+        solutions in memory and, if path is given, every solution in the
+        sqlite database at path, dropping the least recently used ones
+        once their paths take more than max_disk_bytes.
+
+        @type self: SolutionCache
+        @type path: str | None
+        @type capacity: int
+        @type max_disk_bytes: int | None
+        @rtype: None
+        """
+        self.capacity, self.max_disk_bytes = capacity, max_disk_bytes
+        self.hits = self.disk_hits = self.misses = 0
+        self.evictions = self.disk_evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                self._db.execute("CREATE TABLE IF NOT EXISTS meta "
+                                 "(name TEXT PRIMARY KEY, value INTEGER)")
+                row = self._db.execute("SELECT value FROM meta WHERE "
+                                       "name = 'format'").fetchone()
+                if row is None or row[0] != FORMAT_VERSION:
+                    self._db.execute("DROP TABLE IF EXISTS solutions")
+                    self._db.execute("INSERT OR REPLACE INTO meta "
+                                     "VALUES ('format', ?)",
+                                     (FORMAT_VERSION,))
+                self._db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                                 "(key TEXT PRIMARY KEY, path TEXT, "
+                                 "used INTEGER)")
+            self._clock = self._db.execute(
+                "SELECT COALESCE(MAX(used), 0) FROM solutions").fetchone()[0]
+
+    def solve(self, puzzle, strategy="depth_first", budget=None,
+              stats=None):
+        """
+        Return the solution of puzzle found by the solver named strategy
+        in puzzle_tools.STRATEGIES, from SolutionCache self if it is
+        there, else by running the solver with budget and stats and
+        caching what it returns.
+
+        @type self: SolutionCache
+        @type puzzle: Puzzle
+        @type strategy: str
+        @type budget: Budget | None
+        @type stats: SearchStats | None
+        @rtype: PuzzleNode | BudgetExceeded | None
+
+        >>> from mn_puzzle import MNPuzzle
+        >>> cache = SolutionCache()
+        >>> p = MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+        ...              (("1", "2", "3"), ("4", "5", "*")))
+        >>> str(cache.solve(p)) == str(cache.solve(p))
+        True
+        >>> print(cache)
+        1 hits (0 from disk), 1 misses, 0 evictions
+
+        An entry that cannot be replayed counts as a miss, not a hit:
+
+        >>> cache.put(cache.key(p, "depth_first"), [b"stale"])
+        >>> str(cache.solve(p)) == str(cache.solve(p))
+        True
+        >>> print(cache)
+        2 hits (0 from disk), 2 misses, 0 evictions
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), "solutions.db")
+        >>> SolutionCache(path).put(cache.key(p, "depth_first"), [b"stale"])
+        >>> cache = SolutionCache(path)
+        >>> cache.solve(p) is not None
+        True
+        >>> print(cache)
+        0 hits (0 from disk), 1 misses, 0 evictions
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError("unknown strategy {!r}".format(strategy))
+        key = self.key(puzzle, strategy)
+        keys, tier = self._lookup(key)
+        if keys is None:
+            return None
+        if keys is not _MISSING:
+            try:
+                return path_from_keys(puzzle, keys)
+            except ValueError:
+                # stored by an older form of the puzzle: solve it again
+                self._forget(key, tier)
+        solution = STRATEGIES[strategy](puzzle, budget=budget, stats=stats)
+        if not isinstance(solution, BudgetExceeded):
+            keys = None
+            if solution is not None:
+                keys = [p.state_key() for p in solution.puzzles()][1:]
+            self.put(key, keys)
+        return solution
+
+    @staticmethod
+    def key(puzzle, strategy):
+        """
+        Return the cache key of puzzle solved by strategy: a digest of
+        the type and problem key of puzzle, and strategy.
+
+        @type puzzle: Puzzle
+        @type strategy: str
+        @rtype: str
+
+        >>> from word_ladder_puzzle import WordLadderPuzzle
+        >>> w = WordLadderPuzzle("sad", "bad", {"sad", "bad"})
+        >>> SolutionCache.key(w, "a_star") == SolutionCache.key(w, "a_star")
+        True
+        >>> SolutionCache.key(w, "a_star") == SolutionCache.key(w,
+        ...                                                     "ida_star")
+        False
+        """
+        return sha256(repr((strategy, type(puzzle).__name__,
+                            puzzle.problem_key())).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Return the state keys along the cached solution under key in
+        SolutionCache self, None if it is cached as unsolvable, or
+        _MISSING if it is not cached.
+
+        @type self: SolutionCache
+        @type key: str
+        @rtype: list[object] | None | object
+        """
+        return self._lookup(key)[0]
+
+    def _lookup(self, key):
+        """
+        Return what get(key) returns for SolutionCache self, and the
+        tier it was found in: "memory", "disk", or None.
+
+        @type self: SolutionCache
+        @type key: str
+        @rtype: (list[object] | None | object, str | None)
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                # keep the disk tier's recency in step, so its eviction
+                # spares entries used from memory
+                if self._db is not None:
+                    self._touch(key)
+                return self._memory[key], "memory"
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT path FROM solutions WHERE key = ?",
+                    (key,)).fetchone()
+                if row is not None:
+                    self._touch(key)
+                    self.disk_hits += 1
+                    keys = literal_eval(row[0])
+                    self._remember(key, keys)
+                    return keys, "disk"
+            self.misses += 1
+            return _MISSING, None
+
+    def put(self, key, keys):
+        """
+        Cache keys, the state keys along a solution (or None for an
+        unsolvable puzzle), under key in SolutionCache self.
+
+        @type self: SolutionCache
+        @type key: str
+        @type keys: list[object] | None
+        @rtype: None
+        """
+        with self._lock:
+            self._remember(key, keys)
+            if self._db is not None:
+                self._clock += 1
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO solutions "
+                                     "VALUES (?, ?, ?)",
+                                     (key, repr(keys), self._clock))
+                    self._shrink_disk()
+
+    def clear(self):
+        """
+        Remove every solution from both tiers of SolutionCache self.
+
+        @type self: SolutionCache
+        @rtype: None
+        """
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM solutions")
+
+    def close(self):
+        """
+        Close the database of SolutionCache self, if it has one.
+
+        @type self: SolutionCache
+        @rtype: None
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        """
+        Return the number of solutions in the memory tier of
+        SolutionCache self.
+
+        @type self: SolutionCache
+        @rtype: int
+        """
+        return len(self._memory)
+
+    def __str__(self):
+        """
+        Return a human-readable string of the counters of SolutionCache
+        self.
+
+        @type self: SolutionCache
+        @rtype: str
+        """
+        return ("{} hits ({} from disk), {} misses, {} evictions".format(
+            self.hits + self.disk_hits, self.disk_hits, self.misses,
+            self.evictions + self.disk_evictions))
+
+    def _touch(self, key):
+        """
+        Mark the row under key in the database of SolutionCache self as
+        the most recently used.
+
+        @type self: SolutionCache
+        @type key: str
+        @rtype: None
+        """
+        self._clock += 1
+        with self._db:
+            self._db.execute("UPDATE solutions SET used = ? WHERE key = ?",
+                             (self._clock, key))
+
+    def _forget(self, key, tier=None):
+        """
+        Remove the solution under key from both tiers of SolutionCache
+        self.  If it was just found in tier, count that as a miss
+        rather than a hit.
+
+        @type self: SolutionCache
+        @type key: str
+        @type tier: str | None
+        @rtype: None
+        """
+        with self._lock:
+            if tier == "memory":
+                self.hits -= 1
+                self.misses += 1
+            elif tier == "disk":
+                self.disk_hits -= 1
+                self.misses += 1
+            self._memory.pop(key, None)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM solutions WHERE key = ?",
+                                     (key,))
+
+    def _remember(self, key, keys):
+        """
+        Put keys under key in the memory tier of SolutionCache self,
+        evicting the least recently used entry if it is full.
+
+        @type self: SolutionCache
+        @type key: str
+        @type keys: list[object] | None
+        @rtype: None
+        """
+        self._memory[key] = keys
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _shrink_disk(self):
+        """
+        Delete the least recently used rows of the database of
+        SolutionCache self until their paths fit in max_disk_bytes.
+
+        @type self: SolutionCache
+        @rtype: None
+        """
+        if self.max_disk_bytes is None:
+            return
+        excess = self._db.execute("SELECT COALESCE(SUM(LENGTH(path)), 0) "
+                                  "FROM solutions").fetchone()[0]
+        excess -= self.max_disk_bytes
+        if excess <= 0:
+            return
+        doomed = []
+        for key, size in self._db.execute("SELECT key, LENGTH(path) "
+                                          "FROM solutions ORDER BY used"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM solutions WHERE key = ?", doomed)
+        self.disk_evictions += len(doomed)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
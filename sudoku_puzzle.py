@@ -55,6 +55,45 @@ class SudokuPuzzle(Puzzle):
                 self._n == other._n and self._symbols == other._symbols and
                 self._symbol_set == other._symbol_set)
 
+    def __hash__(self):
+        """
+        Return a hash of SudokuPuzzle self consistent with __eq__.
+
+        @type self: SudokuPuzzle
+        @rtype: int
+        """
+        return hash(self.state_key())
+
+    def state_key(self):
+        """
+        Return a hashable key for the current symbols of SudokuPuzzle self.
+
+        @type self: SudokuPuzzle
+        @rtype: tuple[str]
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["D", "C", "B", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> s.state_key() == tuple(grid)
+        True
+        """
+        return tuple(self._symbols)
+
+    def problem_key(self):
+        """
+        Return a key for the symbols and symbol set of SudokuPuzzle self.
+
+        @type self: SudokuPuzzle
+        @rtype: tuple[tuple[str]]
+
+        >>> s = SudokuPuzzle(4, ["*"] * 16, {"A", "B", "C", "D"})
+        >>> s.problem_key()[1]
+        ('A', 'B', 'C', 'D')
+        """
+        return tuple(self._symbols), tuple(sorted(self._symbol_set))
+
     def __str__(self):
         """
         Return a human-readable string representation of SudokuPuzzle self.
@@ -161,26 +200,102 @@ class SudokuPuzzle(Puzzle):
         >>> all([s in L1 for s in L2])
         True
         """
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """
+        Yield the extensions of SudokuPuzzle self one at a time, in the
+        order of extensions().
+
+        @type self: SudokuPuzzle
+        @rtype: iterator[SudokuPuzzle]
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["C", "D", "A", "B"]
+        >>> grid += ["B", "A", "D", "C"]
+        >>> grid += ["D", "C", "B", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> list(s.iter_extensions()) == s.extensions()
+        True
+        """
         # convenient names
         symbols, symbol_set, n = self._symbols, self._symbol_set, self._n
         if "*" not in symbols:
-            # return an empty list
-            return [_ for _ in []]
-        else:
-            # position of first empty position
-            i = symbols.index("*")
-            # allowed symbols at position i
-            # A | B == A.union(B)
-            allowed_symbols = (self._symbol_set -
-                               (self._row_set(i) |
-                                self._column_set(i) |
-                                self._subsquare_set(i)))
-            # list of SudokuPuzzles with each legal digit at position i
-            return (
-                [SudokuPuzzle(n,
-                 symbols[:i] + [d] + symbols[i + 1:], symbol_set)
-                 for d in allowed_symbols])
+            return
+        # position of first empty position
+        i = symbols.index("*")
+        # allowed symbols at position i
+        # A | B == A.union(B)
+        allowed_symbols = (self._symbol_set -
+                           (self._row_set(i) |
+                            self._column_set(i) |
+                            self._subsquare_set(i)))
+        # a SudokuPuzzle with each legal digit at position i, in sorted
+        # order so searches do not depend on string hashing
+        for d in sorted(allowed_symbols):
+            yield SudokuPuzzle(n, symbols[:i] + [d] + symbols[i + 1:],
+                               symbol_set)
+
+    def legal_moves(self):
+        """
+        Return the moves of SudokuPuzzle self, in the order of
+        extensions(): a move (i, d) writes symbol d at position i.
+
+        @type self: SudokuPuzzle
+        @rtype: list[(int, str)]
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["C", "D", "A", "B"]
+        >>> grid += ["B", "A", "D", "C"]
+        >>> grid += ["D", "C", "*", "*"]
+        >>> SudokuPuzzle(4, grid, {"A", "B", "C", "D"}).legal_moves()
+        [(14, 'B')]
+        """
+        symbols = self._symbols
+        if "*" not in symbols:
+            return []
+        i = symbols.index("*")
+        allowed_symbols = (self._symbol_set -
+                           (self._row_set(i) |
+                            self._column_set(i) |
+                            self._subsquare_set(i)))
+        return [(i, d) for d in sorted(allowed_symbols)]
+
+    def apply_move(self, move):
+        """
+        Write a symbol into SudokuPuzzle self as move says.
+
+        @type self: SudokuPuzzle
+        @type move: (int, str)
+        @rtype: None
+        """
+        i, d = move
+        self._symbols[i] = d
 
+    def undo_move(self, move):
+        """
+        Empty the position move wrote to in SudokuPuzzle self.
+
+        @type self: SudokuPuzzle
+        @type move: (int, str)
+        @rtype: None
+        """
+        self._symbols[move[0]] = "*"
+
+    def copy(self):
+        """
+        Return a copy of SudokuPuzzle self.
+
+        @type self: SudokuPuzzle
+        @rtype: SudokuPuzzle
+
+        >>> s = SudokuPuzzle(4, ["*"] * 16, {"A", "B", "C", "D"})
+        >>> t = s.copy()
+        >>> t.apply_move((0, "A"))
+        >>> s.state_key()[0], t.state_key()[0]
+        ('*', 'A')
+        """
+        return SudokuPuzzle(self._n, self._symbols[:], self._symbol_set)
 
     def fail_fast(self):
 
@@ -280,19 +395,14 @@ if __name__ == "__main__":
                       "*", "6", "*", "3", "*", "2", "*", "*", "*"],
                      {"1", "2", "3", "4", "5", "6", "7", "8", "9"})
 
-    from time import time
-
+    # for timings, run benchmark.py
     print("solving sudoku from July 9 2015 Star... \n\n{}\n\n".format(s))
     from puzzle_tools import depth_first_solve
 
-    start = time()
     sol = depth_first_solve(s)
     print(sol)
     while sol.children:
         sol = sol.children[0]
-    end = time()
-    print("time to solve 9x9 using depth_first: "
-          "{} seconds\n".format(end - start))
     print(sol)
 
     s = SudokuPuzzle(9,
@@ -309,13 +419,9 @@ if __name__ == "__main__":
 
     print("solving 3-star sudoku from \"That's Puzzling\","
           "November 14th 2015\n\n{}\n\n".format(s))
-    start = time()
     sol = depth_first_solve(s)
     while sol.children:
         sol = sol.children[0]
-    end = time()
-    print("time to solve 9x9 using depth_first: {} seconds\n".format(
-        end - start))
     print(sol)
 
     s = SudokuPuzzle(9,
@@ -334,11 +440,7 @@ if __name__ == "__main__":
         "solving 4-star sudoku from \"That's Puzzling\", "
         "November 14th 2015\n\n{}\n\n".format(
             s))
-    start = time()
     sol = depth_first_solve(s)
     while sol.children:
         sol = sol.children[0]
-    end = time()
-    print("time to solve 9x9 using depth_first: {} seconds\n".format(
-        end - start))
     print(sol)
\ No newline at end of file
@@ -1,4 +1,5 @@
 from puzzle import Puzzle
+from hashlib import sha1
 
 
 class WordLadderPuzzle(Puzzle):
@@ -21,6 +22,8 @@ class WordLadderPuzzle(Puzzle):
                                                             to_word, ws)
         # set of characters to use for 1-character changes
         self._chars = "abcdefghijklmnopqrstuvwxyz"
+        # digest of ws for problem_key, worked out when first needed
+        self._digest = None
 
     def __eq__(self, other):
         """
@@ -36,7 +39,56 @@ class WordLadderPuzzle(Puzzle):
         True
         """
         return (type(other) == type(self) and self._from_word == other._from_word
-                and self._to_word == other._to_word and self._word_set == other._word_set)
+                and self._to_word == other._to_word
+                and (self._word_set is other._word_set or
+                     self._word_set == other._word_set))
+
+    def __hash__(self):
+        """
+        Return a hash of WordLadderPuzzle self consistent with __eq__.
+
+        @type self: WordLadderPuzzle
+        @rtype: int
+        """
+        return hash(self.state_key())
+
+    def state_key(self):
+        """
+        Return a hashable key for the current word of WordLadderPuzzle self.
+
+        The word set is shared by every puzzle in a search, so it is
+        left out of the key.
+
+        @type self: WordLadderPuzzle
+        @rtype: str
+
+        >>> WordLadderPuzzle("sad", "bad", {"sad", "bad"}).state_key()
+        'sad'
+        """
+        return self._from_word
+
+    def problem_key(self):
+        """
+        Return a key for the words and word set of WordLadderPuzzle self.
+        The word set enters the key as a digest of its sorted words,
+        worked out once for every puzzle sharing the set.
+
+        @type self: WordLadderPuzzle
+        @rtype: tuple[str]
+
+        >>> w = WordLadderPuzzle("sad", "bad", {"sad", "bad"})
+        >>> w.problem_key()[:2]
+        ('sad', 'bad')
+        >>> w.problem_key() == WordLadderPuzzle("sad", "bad",
+        ...                                     {"bad", "sad"}).problem_key()
+        True
+        >>> w.problem_key() == WordLadderPuzzle("sad", "bad",
+        ...                                     {"sad", "bad", "cad"}).problem_key()
+        False
+        """
+        if self._digest is None:
+            self._digest = _word_set_digest(self._word_set)
+        return self._from_word, self._to_word, self._digest
 
     def __str__(self):
         """
@@ -59,16 +111,86 @@ class WordLadderPuzzle(Puzzle):
         @type self: WordLadderPuzzle
         @rtype: list[WordLadderPuzzle]
         """
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """
+        Yield the extensions of WordLadderPuzzle self one at a time, in
+        the order of extensions().
+
+        @type self: WordLadderPuzzle
+        @rtype: iterator[WordLadderPuzzle]
+
+        >>> w = WordLadderPuzzle("sad", "bat", {"sad", "bad", "sat", "cad"})
+        >>> [str(e) for e in w.iter_extensions()]
+        ['bad --> bat', 'cad --> bat', 'sat --> bat']
+        """
         from_word, to_word, ws, chars = self._from_word, self._to_word, self._word_set, self._chars
-        ext_list = []
         for i in range(len(from_word)):
             for char in chars:
                 new_word = ""
                 if char != from_word[i]:
                     new_word += from_word[:i] + char + from_word[i+1:]
                     if new_word in ws:
-                         ext_list.append(WordLadderPuzzle(new_word, to_word, ws))
-        return ext_list
+                         yield WordLadderPuzzle(new_word, to_word, ws)
+
+    def encode_state(self):
+        """
+        Return the current word of WordLadderPuzzle self as bytes, four
+        per character, so every word of its length encodes to the same
+        length.
+
+        @type self: WordLadderPuzzle
+        @rtype: bytes
+
+        >>> w = WordLadderPuzzle("sad", "bad", {"sad", "bad"})
+        >>> len(w.encode_state())
+        12
+        >>> print(w.decode_state(WordLadderPuzzle("bad", "bad", {}).encode_state()))
+        bad --> bad
+        """
+        return self._from_word.encode("utf-32-le")
+
+    def decode_state(self, data):
+        """
+        Return the WordLadderPuzzle with the target and word set of
+        WordLadderPuzzle self whose word encode_state turned into data.
+
+        @type self: WordLadderPuzzle
+        @type data: bytes
+        @rtype: WordLadderPuzzle
+        """
+        return WordLadderPuzzle(data.decode("utf-32-le"), self._to_word,
+                                self._word_set)
+
+    def heuristic(self):
+        """
+        Return the number of positions where the current word of
+        WordLadderPuzzle self differs from to_word.  Each step changes
+        one character, so this never overestimates the steps left.
+
+        @type self: WordLadderPuzzle
+        @rtype: int
+
+        >>> WordLadderPuzzle("same", "cost", {"same", "cost"}).heuristic()
+        4
+        """
+        from_word, to_word = self._from_word, self._to_word
+        return (sum([a != b for (a, b) in zip(from_word, to_word)]) +
+                abs(len(from_word) - len(to_word)))
+
+    def reversed(self):
+        """
+        Return the WordLadderPuzzle from to_word to from_word of
+        WordLadderPuzzle self, using the same word set.
+
+        @type self: WordLadderPuzzle
+        @rtype: WordLadderPuzzle
+
+        >>> print(WordLadderPuzzle("same", "cost", {"same", "cost"}).reversed())
+        cost --> same
+        """
+        return WordLadderPuzzle(self._to_word, self._from_word, self._word_set)
 
     def is_solved(self):
         """
@@ -96,27 +218,56 @@ class WordLadderPuzzle(Puzzle):
             return True
         return False
 
+
+
+# the digests of the word sets hashed last, by id, each kept with the
+# set itself, so the id is not reused while cached, and its size when
+# it was hashed
+_digests = {}
+DIGESTS_KEPT = 8
+
+
+def _word_set_digest(ws):
+    """
+    Return a digest of the sorted words of ws.  The word set is hashed
+    only once however many puzzles share it, unless its size changes.
+
+    @type ws: set[str]
+    @rtype: str
+
+    >>> ws = {"sad", "bad"}
+    >>> _word_set_digest(ws) == _word_set_digest({"bad", "sad"})
+    True
+    >>> _digests[id(ws)][0] is ws
+    True
+    """
+    cached = _digests.get(id(ws))
+    if cached is not None and cached[0] is ws and cached[1] == len(ws):
+        return cached[2]
+    digest = sha1("\n".join(sorted(ws)).encode()).hexdigest()
+    _digests.pop(id(ws), None)
+    if len(_digests) >= DIGESTS_KEPT:
+        del _digests[next(iter(_digests))]
+    _digests[id(ws)] = (ws, len(ws), digest)
+    return digest
+
 #
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
     from puzzle_tools import breadth_first_solve, depth_first_solve
-    from time import time
+    # for timings, run benchmark.py
     with open("words.txt", "r") as words:
         word_set = set(words.read().split())
     w = WordLadderPuzzle("same", "cost", word_set)
-    start = time()
     sol = breadth_first_solve(w)
-    end = time()
     print("Solving word ladder from same->cost")
     print("...using breadth-first-search")
-    print("Solutions: {} took {} seconds.".format(sol, end - start))
-    start = time()
+    print("Solutions: {}".format(sol))
     sol = depth_first_solve(w)
-    end = time()
     print("Solving word ladder from same->cost")
     print("...using depth-first-search")
-    print("Solutions: {} took {} seconds.".format(sol, end - start))
+    print("Solutions: {}".format(sol))
 
 
 